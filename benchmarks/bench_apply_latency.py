@@ -0,0 +1,136 @@
+"""
+Measure the end-to-end latency of applying scenes, from handing an intent to
+SceneSkill.process_request until the last device publish is acknowledged.
+
+The skill runs against an in-memory SQLite database and the broker stand-in from fake_broker,
+where every acknowledged publish waits a simulated round-trip of 2 ms. Each scene size is applied
+REQUESTS times one after another, enough samples for a p99. Results are printed as one JSON object
+per line with p50, p95, p99 and max latency in milliseconds and the throughput in requests and
+devices per second. The sequential 1000-device run alone takes a few minutes.
+Run with ``python benchmarks/bench_apply_latency.py``.
+"""
+
+import asyncio
+import json
+import logging
+import statistics
+import time
+import uuid
+
+import jinja2
+from fake_broker import FakeBrokerClient
+from private_assistant_commons import messages
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from private_assistant_scene_skill.config import SkillConfig
+from private_assistant_scene_skill.models import SceneSkillDevices, SceneSkillScenes
+from private_assistant_scene_skill.scene_skill import SceneSkill
+
+DEVICE_COUNTS = [1, 10, 100, 1000]
+CONCURRENCY = [1, 32]
+REQUESTS = 100
+ACK_LATENCY = 0.002
+DEVICE_TOPIC_PREFIX = "zigbee2mqtt/"
+
+
+class ApplyClient(FakeBrokerClient):
+    """Broker stand-in that signals when the expected number of device publishes was acknowledged."""
+
+    def __init__(self, ack_latency: float) -> None:
+        super().__init__(ack_latency)
+        self._remaining = 0
+        self._applied = asyncio.Event()
+
+    def expect(self, device_count: int) -> asyncio.Event:
+        self.messages.clear()
+        self._remaining = device_count
+        self._applied = asyncio.Event()
+        return self._applied
+
+    async def publish(self, topic: str, payload: bytes | str = b"", qos: int = 0, retain: bool = False) -> None:
+        await super().publish(topic, payload, qos=qos, retain=retain)
+        if topic.startswith(DEVICE_TOPIC_PREFIX):
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._applied.set()
+
+
+async def create_scenes(db_engine: AsyncEngine) -> None:
+    async with db_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(db_engine) as session:
+        for device_count in DEVICE_COUNTS:
+            scene = SceneSkillScenes(name=f"bench{device_count}")
+            scene.devices = [
+                SceneSkillDevices(topic=f"{DEVICE_TOPIC_PREFIX}bench{device_count}/light{i}/set")
+                for i in range(device_count)
+            ]
+            session.add(scene)
+        await session.commit()
+
+
+def intent(device_count: int) -> messages.IntentAnalysisResult:
+    return messages.IntentAnalysisResult(
+        client_request=messages.ClientRequest(
+            id=uuid.uuid4(),
+            text=f"apply scene bench{device_count}",
+            room="bench",
+            output_topic="assistant/bench/output",
+        ),
+        numbers=[],
+        nouns=["scene", f"bench{device_count}"],
+        verbs=["apply"],
+    )
+
+
+async def measure(db_engine: AsyncEngine, device_count: int, concurrency: int) -> dict[str, float | int]:
+    client = ApplyClient(ack_latency=ACK_LATENCY)
+    logger = logging.getLogger(__name__)
+    template_env = jinja2.Environment(loader=jinja2.PackageLoader("private_assistant_scene_skill", "templates"))
+    latencies = []
+    async with asyncio.TaskGroup() as task_group:
+        skill = SceneSkill(
+            config_obj=SkillConfig(publish_concurrency=concurrency, live_scene_updates_enabled=False),
+            mqtt_client=client,  # type: ignore[arg-type]
+            db_engine=db_engine,
+            template_env=template_env,
+            task_group=task_group,
+            logger=logger,
+        )
+        await skill.skill_preparations()
+        started_at = time.perf_counter()
+        for _ in range(REQUESTS):
+            applied = client.expect(device_count)
+            request_started_at = time.perf_counter()
+            await skill.process_request(intent(device_count))
+            await applied.wait()
+            latencies.append((time.perf_counter() - request_started_at) * 1000)
+        duration = time.perf_counter() - started_at
+    cut_points = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "devices": device_count,
+        "concurrency": concurrency,
+        "requests": REQUESTS,
+        "p50_ms": round(cut_points[49], 3),
+        "p95_ms": round(cut_points[94], 3),
+        "p99_ms": round(cut_points[98], 3),
+        "max_ms": round(max(latencies), 3),
+        "requests_per_second": round(REQUESTS / duration, 1),
+        "devices_per_second": round(REQUESTS * device_count / duration, 1),
+    }
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.WARNING)
+    db_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    await create_scenes(db_engine)
+    for device_count in DEVICE_COUNTS:
+        for concurrency in CONCURRENCY:
+            print(json.dumps(await measure(db_engine, device_count, concurrency)), flush=True)
+    await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Measure loading the scene cache from the database: ORM instances loaded with selectinload against
+the column-only rows of scene_rows_query streamed into SceneCacheLoader.
+
+The scenes are stored in a temporary SQLite database. Wall time is the best of RUNS runs, peak memory
+is measured with tracemalloc in a separate run, as tracing slows down allocations. Results are printed
+as one JSON object per loader. Run with ``python benchmarks/bench_cache_load.py``.
+"""
+
+import asyncio
+import gc
+import json
+import pathlib
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import selectinload
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from private_assistant_scene_skill.models import DEVICES_TABLE, SCENES_TABLE, DeviceRecord, SceneSkillScenes, utc_now
+from private_assistant_scene_skill.scene_cache import SceneCache, SceneCacheLoader, scene_rows_query
+from private_assistant_scene_skill.scene_skill import SCENE_LOAD_BATCH_SIZE
+
+SCENES = 1000
+DEVICES_PER_SCENE = 100
+RUNS = 3
+
+
+async def create_scenes(db_engine: AsyncEngine) -> None:
+    updated_at = utc_now()
+    async with db_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            insert(SCENES_TABLE),
+            [{"id": i + 1, "name": f"scene {i}", "updated_at": updated_at} for i in range(SCENES)],
+        )
+        await conn.execute(
+            insert(DEVICES_TABLE),
+            [
+                {
+                    "topic": f"zigbee2mqtt/room{scene}/light{i}/set",
+                    "scene_payload": '{"state":"ON"}',
+                    "scene_id": scene + 1,
+                    "updated_at": updated_at,
+                }
+                for scene in range(SCENES)
+                for i in range(DEVICES_PER_SCENE)
+            ],
+        )
+
+
+async def load_orm(db_engine: AsyncEngine) -> SceneCache:
+    async with AsyncSession(db_engine) as session:
+        result = (await session.exec(select(SceneSkillScenes).options(selectinload("*")))).all()
+        cache = SceneCache()
+        for scene in result:
+            cache.set_scene(
+                scene.name, [DeviceRecord.from_device(device) for device in scene.devices], scene_id=scene.id
+            )
+        return cache
+
+
+async def load_rows(db_engine: AsyncEngine) -> SceneCache:
+    loader = SceneCacheLoader()
+    async with AsyncSession(db_engine) as session:
+        rows = await session.stream(scene_rows_query().execution_options(yield_per=SCENE_LOAD_BATCH_SIZE))
+        async for partition in rows.partitions():
+            loader.add_rows(partition)
+    return loader.finish()
+
+
+async def measure(name: str, load: Callable[[AsyncEngine], Awaitable[SceneCache]], db_engine: AsyncEngine) -> dict:
+    durations = []
+    for _ in range(RUNS):
+        gc.collect()
+        started_at = time.perf_counter()
+        cache = await load(db_engine)
+        durations.append(time.perf_counter() - started_at)
+        assert sum(1 for _ in cache.devices()) == SCENES * DEVICES_PER_SCENE
+        del cache
+
+    gc.collect()
+    tracemalloc.start()
+    cache = await load(db_engine)
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "loader": name,
+        "devices": SCENES * DEVICES_PER_SCENE,
+        "wall_time_s": round(min(durations), 3),
+        "peak_memory_mb": round(peak_bytes / 2**20, 1),
+        "retained_memory_mb": round(current_bytes / 2**20, 1),
+        "scenes": len(cache),
+    }
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db_engine = create_async_engine(f"sqlite+aiosqlite:///{pathlib.Path(directory) / 'scenes.db'}")
+        await create_scenes(db_engine)
+        for name, load in (("orm_selectinload", load_orm), ("streamed_rows", load_rows)):
+            print(json.dumps(await measure(name, load, db_engine)), flush=True)
+        await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
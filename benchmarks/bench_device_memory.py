@@ -0,0 +1,74 @@
+"""
+Measure the memory held per cached device: ORM instances as loaded before against DeviceRecord.
+
+Run with ``python benchmarks/bench_device_memory.py``.
+"""
+
+import asyncio
+import gc
+import sys
+import tracemalloc
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import selectinload
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from private_assistant_scene_skill.models import DeviceRecord, SceneSkillDevices, SceneSkillScenes
+from private_assistant_scene_skill.scene_cache import SceneCache
+
+SCENES = 100
+DEVICES_PER_SCENE = 100
+
+
+async def main() -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        for scene_number in range(SCENES):
+            scene = SceneSkillScenes(name=f"scene {scene_number}")
+            scene.devices = [
+                SceneSkillDevices(topic=f"zigbee2mqtt/room{scene_number}/light{i}/set", scene_payload='{"state":"ON"}')
+                for i in range(DEVICES_PER_SCENE)
+            ]
+            session.add(scene)
+        await session.commit()
+
+    devices = SCENES * DEVICES_PER_SCENE
+    async with AsyncSession(engine) as session:
+        gc.collect()
+        tracemalloc.start()
+        result = (await session.exec(select(SceneSkillScenes).options(selectinload("*")))).all()
+        orm_cache = {scene.name: list(scene.devices) for scene in result}
+        gc.collect()
+        orm_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        record_cache = SceneCache(
+            {scene.name: [DeviceRecord.from_device(device) for device in scene.devices] for scene in result}
+        )
+        gc.collect()
+        cache_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        records = [DeviceRecord.from_device(device) for scene_devices in orm_cache.values() for device in scene_devices]
+        gc.collect()
+        record_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    string_bytes = sum(sys.getsizeof(record.topic) + sys.getsizeof(record.payload) for record in records)
+    print(f"devices: {devices}")
+    print(f"ORM instances via selectinload: {orm_bytes / devices:8.0f} bytes/device")
+    print(f"DeviceRecord only:              {record_bytes / devices:8.0f} bytes/device")
+    print(f"SceneCache with all indexes:    {cache_bytes / devices:8.0f} bytes/device")
+    print(f"Records reuse the loaded topic and payload strings: {string_bytes / devices:.0f} bytes/device")
+    assert len(record_cache) == SCENES
+    assert len(records) == devices
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
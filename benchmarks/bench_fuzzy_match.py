@@ -0,0 +1,59 @@
+"""
+Measure fuzzy scene lookup latency of SceneCache.fuzzy_match for growing scene catalogs.
+
+Run with ``python benchmarks/bench_fuzzy_match.py``.
+"""
+
+import random
+import statistics
+import time
+
+from private_assistant_scene_skill.scene_cache import SceneCache
+
+SCENE_COUNTS = [1_000, 10_000, 100_000]
+QUERIES = 500
+MAX_DISTANCE = 2
+TIME_BUDGET_MS = 5.0
+SYLLABLES = ["ro", "man", "tic", "mor", "ning", "eve", "din", "ner", "mo", "vie", "night", "re", "lax", "par", "ty"]
+
+
+def random_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) + str(rng.randint(0, 99))
+
+
+def unique_names(rng: random.Random, count: int) -> list[str]:
+    """Return count distinct random names, drawing again whenever a name repeats."""
+    names: dict[str, None] = {}
+    while len(names) < count:
+        names[random_name(rng)] = None
+    return list(names)
+
+
+def misspell(rng: random.Random, name: str) -> str:
+    position = rng.randrange(len(name))
+    return name[:position] + rng.choice("aeiouxyz") + name[position + 1 :]
+
+
+def main() -> None:
+    rng = random.Random(42)
+    print(f"{'scenes':>8} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8} {'hit_rate':>8}")
+    for count in SCENE_COUNTS:
+        names = unique_names(rng, count)
+        cache = SceneCache({name: [] for name in names})
+        latencies = []
+        hits = 0
+        for _ in range(QUERIES):
+            query = misspell(rng, rng.choice(names))
+            start = time.perf_counter()
+            found = cache.fuzzy_match([query], "", MAX_DISTANCE, TIME_BUDGET_MS)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += bool(found)
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{len(names):>8} {percentiles[49]:>8.3f} {percentiles[98]:>8.3f} {max(latencies):>8.3f}"
+            f" {hits / QUERIES:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
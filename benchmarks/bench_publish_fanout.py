@@ -0,0 +1,49 @@
+"""
+Measure the wall-clock time to apply a scene with sequential and concurrent publishing, and
+with QoS 0 devices that are not acknowledged at all.
+
+Every acknowledged publish waits a simulated broker round-trip of 2 ms.
+Run with ``python benchmarks/bench_publish_fanout.py``.
+"""
+
+import asyncio
+import logging
+import time
+
+from fake_broker import FakeBrokerClient
+
+from private_assistant_scene_skill.metrics import PublishMetrics
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.publisher import ScenePublisher
+
+DEVICE_COUNTS = [1, 10, 60, 200, 500]
+CONCURRENCY = [1, 8, 32]
+ACK_LATENCY = 0.002
+
+
+async def apply_time(device_count: int, concurrency: int, qos: int = 1) -> float:
+    client = FakeBrokerClient(ack_latency=ACK_LATENCY)
+    publisher = ScenePublisher(
+        client,  # type: ignore[arg-type]
+        concurrency=concurrency,
+        metrics=PublishMetrics(),
+        logger=logging.getLogger(__name__),
+    )
+    devices = [
+        DeviceRecord(topic=f"zigbee2mqtt/light{i}/set", payload=b'{"state":"ON"}', qos=qos) for i in range(device_count)
+    ]
+    started_at = time.perf_counter()
+    await publisher.publish(devices)
+    return time.perf_counter() - started_at
+
+
+async def main() -> None:
+    print(f"{'devices':>8}" + "".join(f" {f'n={n}_ms':>10}" for n in CONCURRENCY) + f" {'qos0_ms':>10}")
+    for device_count in DEVICE_COUNTS:
+        timings = [await apply_time(device_count, concurrency) for concurrency in CONCURRENCY]
+        timings.append(await apply_time(device_count, CONCURRENCY[-1], qos=0))
+        print(f"{device_count:>8}" + "".join(f" {timing * 1000:>10.1f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
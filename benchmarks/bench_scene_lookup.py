@@ -0,0 +1,56 @@
+"""
+Compare noun to scene resolution of the old linear scan against the SceneCache index and
+show that multi-word matching through the token trie does not grow with the scene count.
+
+Run with ``python benchmarks/bench_scene_lookup.py``.
+"""
+
+import functools
+import timeit
+
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.scene_cache import SceneCache
+
+SCENE_COUNTS = [1, 2, 5, 10, 50, 100, 1_000, 10_000]
+NOUNS = ["please", "scene", "scene_7", "lights"]
+TRIE_SCENE_COUNTS = [100, 1_000, 10_000, 50_000]
+TEXT = "please apply the scene movie night 7 and good morning 42 in the living room"
+REPEAT = 5
+
+
+def linear_scan(scenes: dict[str, list[DeviceRecord]], nouns: list[str]) -> list[str]:
+    nouns_lower = [n.lower() for n in nouns]
+    return [name for name in scenes if name in nouns_lower]
+
+
+def indexed(cache: SceneCache, nouns: list[str]) -> list[str]:
+    return cache.match(nouns)
+
+
+def main() -> None:
+    device = DeviceRecord(topic="light/1", payload=b"ON")
+    print(f"{'scenes':>8} {'scan_us':>10} {'index_us':>10}")
+    crossover = None
+    for count in SCENE_COUNTS:
+        scenes = {f"scene_{i}": [device] for i in range(count)}
+        cache = SceneCache(scenes)
+        number = max(1, 100_000 // count)
+        scan = min(timeit.repeat(functools.partial(linear_scan, scenes, NOUNS), number=number, repeat=REPEAT)) / number
+        index = min(timeit.repeat(functools.partial(indexed, cache, NOUNS), number=number, repeat=REPEAT)) / number
+        if crossover is None and index < scan:
+            crossover = count
+        print(f"{count:>8} {scan * 1e6:>10.2f} {index * 1e6:>10.2f}")
+    print(f"Index is faster from {crossover} scenes on." if crossover else "Index never faster in tested range.")
+
+    print(f"\n{'scenes':>8} {'match_us':>10}")
+    for count in TRIE_SCENE_COUNTS:
+        cache = SceneCache(
+            {f"{prefix} {i}": [device] for i in range(count) for prefix in ("movie night", "good morning")}
+        )
+        number = 10_000
+        match = min(timeit.repeat(functools.partial(cache.match, NOUNS, TEXT), number=number, repeat=REPEAT)) / number
+        print(f"{count * 2:>8} {match * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
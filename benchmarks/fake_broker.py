@@ -0,0 +1,21 @@
+"""Stand-in for aiomqtt.Client that simulates the broker round-trip of acknowledged publishes."""
+
+import asyncio
+
+
+class FakeBrokerClient:
+    """
+    Accepts publishes like aiomqtt.Client.
+
+    QoS 0 publishes return immediately, QoS 1 and 2 publishes wait ack_latency seconds as if
+    waiting for the PUBACK/PUBCOMP of a broker.
+    """
+
+    def __init__(self, ack_latency: float = 0.002) -> None:
+        self.ack_latency = ack_latency
+        self.messages: list[tuple[str, bytes | str, int, bool]] = []
+
+    async def publish(self, topic: str, payload: bytes | str = b"", qos: int = 0, retain: bool = False) -> None:
+        self.messages.append((topic, payload, qos, retain))
+        if qos > 0:
+            await asyncio.sleep(self.ack_latency)
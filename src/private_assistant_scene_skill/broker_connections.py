@@ -0,0 +1,89 @@
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from collections.abc import Mapping
+
+import aiomqtt
+
+from private_assistant_scene_skill.config import BrokerConfig
+
+
+class BrokerConnections:
+    """
+    Persistent connections to the additional brokers devices can be assigned to.
+
+    A broker is connected on its first publish and the connection is reused by later requests.
+    A connection that failed is dropped and opened again on the next publish to its broker. After
+    a failed connect, publishes to the broker fail right away for retry_interval seconds instead of
+    each waiting for a connect timeout of their own.
+    """
+
+    def __init__(
+        self,
+        brokers: Mapping[str, BrokerConfig],
+        client_id: str,
+        logger: logging.Logger,
+        retry_interval: float = 5,
+    ) -> None:
+        self.brokers = brokers
+        # Replicas share the configured client id, a broker drops the older session of a duplicate id
+        self.client_id = f"{client_id}-{uuid.uuid4().hex[:8]}"
+        self.logger = logger
+        self.retry_interval = retry_interval
+        self._unavailable_until: dict[str, float] = {}
+        self._clients: dict[str, aiomqtt.Client] = {}
+        self._exit_stacks: dict[str, contextlib.AsyncExitStack] = {}
+        self._locks = {broker: asyncio.Lock() for broker in brokers}
+
+    def __contains__(self, broker: object) -> bool:
+        return broker in self.brokers
+
+    async def client_for(self, broker: str) -> aiomqtt.Client:
+        """Return the connection to broker, connecting it first if needed."""
+        client = self._clients.get(broker)
+        if client is not None:
+            return client
+        self._raise_if_unavailable(broker)
+        async with self._locks[broker]:
+            if broker not in self._clients:
+                # Devices that waited for the lock behind a failed connect fail without retrying it
+                self._raise_if_unavailable(broker)
+                broker_config = self.brokers[broker]
+                stack = contextlib.AsyncExitStack()
+                try:
+                    self._clients[broker] = await stack.enter_async_context(
+                        aiomqtt.Client(
+                            broker_config.host,
+                            port=broker_config.port,
+                            identifier=f"{self.client_id}-{broker}",
+                            logger=self.logger,
+                        )
+                    )
+                except aiomqtt.MqttError:
+                    self._unavailable_until[broker] = time.monotonic() + self.retry_interval
+                    raise
+                self._exit_stacks[broker] = stack
+                self.logger.info("Connected to device broker %s at %s.", broker, broker_config.host)
+            return self._clients[broker]
+
+    def _raise_if_unavailable(self, broker: str) -> None:
+        if time.monotonic() < self._unavailable_until.get(broker, 0):
+            raise aiomqtt.MqttError(f"Broker {broker} is unavailable, retrying its connection later.")
+
+    async def discard(self, broker: str) -> None:
+        """Drop the connection to broker after a failure, the next publish reconnects."""
+        self._clients.pop(broker, None)
+        stack = self._exit_stacks.pop(broker, None)
+        if stack is not None:
+            with contextlib.suppress(aiomqtt.MqttError):
+                await stack.aclose()
+
+    async def run(self) -> None:
+        """Keep the connections open until cancelled, then close them."""
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for broker in list(self._clients):
+                await self.discard(broker)
@@ -0,0 +1,62 @@
+import pathlib
+from typing import Literal
+
+import private_assistant_commons as commons
+from pydantic import BaseModel, PositiveFloat
+
+
+class BrokerConfig(BaseModel):
+    host: str
+    port: int = 1883
+
+
+class SkillConfig(commons.SkillConfig):
+    # Fuzzy scene matching is used only when no scene name matches exactly
+    fuzzy_match_enabled: bool = True
+    fuzzy_match_max_distance: int = 2
+    fuzzy_match_time_budget_ms: float = 5.0
+    # Patch the scene cache from Postgres LISTEN/NOTIFY events instead of waiting for a restart
+    live_scene_updates_enabled: bool = True
+    # Seconds between delta refreshes of the scene cache where LISTEN/NOTIFY is unavailable, None disables it
+    scene_refresh_interval: float | None = None
+    # Which scene wins when several applied scenes address the same topic
+    scene_merge_precedence: Literal["first", "last"] = "last"
+    # Device publishes awaiting their acknowledgement at the same time, 1 publishes one after another
+    publish_concurrency: int = 1
+    # Additional brokers by the name devices refer to in their broker column
+    device_brokers: dict[str, BrokerConfig] = {}
+    # Extra MQTT connections used only for device publishes, 0 publishes on the control connection
+    publish_pool_size: int = 0
+    # Publishes per second allowed for devices whose topic starts with the key, e.g. {"zigbee2mqtt/": 20}
+    publish_rate_limits: dict[str, PositiveFloat] = {}
+    # Seconds in which repeated applies of the same scenes share the first publish wave, 0 disables it
+    apply_coalesce_window: float = 0.0
+    # Seconds to wait for device acknowledgements before answering an apply, None answers right away
+    apply_confirmation_timeout: float | None = None
+    # Mirror device states from their state topics and skip publishes that would not change anything
+    state_mirror_enabled: bool = False
+    state_topic_suffix: str = "/state"
+    # Keep only scene names in memory and load the devices of applied scenes into a bounded cache
+    lazy_scene_devices: bool = False
+    scene_device_cache_size: int = 1000
+    # Most applied scenes whose devices are loaded again after every full reload in lazy mode
+    # The apply counts survive restarts only in the scene snapshot
+    scene_prefetch_count: int = 0
+    # Local snapshot of the scene cache, written after every full load and served at startup until the
+    # database has been read, None disables it
+    scene_snapshot_path: pathlib.Path | None = None
+    # Seconds after which the scene cache is rebuilt in the background while the old snapshot keeps serving
+    scene_cache_ttl: float | None = None
+    # Database connection pool, see the SQLAlchemy QueuePool arguments of the same names
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_pre_ping: bool = False
+    # Seconds after which connections are replaced, None keeps them open
+    db_pool_recycle: int | None = None
+    # Seconds between metric publications on the metrics topic, None disables them
+    metrics_interval: float | None = None
+
+    @property
+    def metrics_topic(self) -> str:
+        return f"{self.base_topic}/{self.client_id}/metrics"
@@ -0,0 +1,73 @@
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
+
+from private_assistant_scene_skill import config
+from private_assistant_scene_skill.metrics import DatabasePoolMetrics
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait for a free connection."""
+
+    metrics: DatabasePoolMetrics | None = None
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.checkout_timeout_count += 1
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_checkout_wait(time.perf_counter() - started_at)
+
+    def recreate(self) -> QueuePool:
+        pool = super().recreate()
+        if isinstance(pool, InstrumentedQueuePool):
+            pool.metrics = self.metrics
+        return pool
+
+
+def create_db_engine(url: str, config_obj: config.SkillConfig) -> AsyncEngine:
+    """Create the async engine with the configured pool and attach pool metrics to it."""
+    db_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=config_obj.db_pool_size,
+        max_overflow=config_obj.db_max_overflow,
+        pool_timeout=config_obj.db_pool_timeout,
+        pool_pre_ping=config_obj.db_pool_pre_ping,
+        pool_recycle=-1 if config_obj.db_pool_recycle is None else config_obj.db_pool_recycle,
+    )
+    metrics = DatabasePoolMetrics(capacity=config_obj.db_pool_size + max(0, config_obj.db_max_overflow))
+    pool = db_engine.sync_engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        pool.metrics = metrics
+
+    def on_connect(*_args) -> None:
+        metrics.opened_connections += 1
+
+    def on_close(*_args) -> None:
+        metrics.closed_connections += 1
+
+    def on_checkout(*_args) -> None:
+        metrics.record_checkout()
+
+    def on_checkin(*_args) -> None:
+        metrics.checked_out -= 1
+
+    event.listen(db_engine.sync_engine, "connect", on_connect)
+    event.listen(db_engine.sync_engine, "close", on_close)
+    event.listen(db_engine.sync_engine, "checkout", on_checkout)
+    event.listen(db_engine.sync_engine, "checkin", on_checkin)
+    return db_engine
+
+
+def pool_metrics(db_engine: AsyncEngine) -> DatabasePoolMetrics | None:
+    """Return the pool metrics of an engine created by create_db_engine."""
+    pool = db_engine.sync_engine.pool
+    return pool.metrics if isinstance(pool, InstrumentedQueuePool) else None
@@ -0,0 +1,114 @@
+import itertools
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+
+# Names counted between two deadline checks, so that a single large posting cannot overrun the budget
+DEADLINE_CHECK_INTERVAL = 1000
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the padded character trigrams of a normalized string."""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int | None:
+    """Return the edit distance of a and b, or None as soon as it must exceed max_distance."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def _chunks(names: Iterable[str]) -> Iterator[list[str]]:
+    iterator = iter(names)
+    while chunk := list(itertools.islice(iterator, DEADLINE_CHECK_INTERVAL)):
+        yield chunk
+
+
+class TrigramIndex:
+    """
+    Trigram postings over normalized scene names for approximate matching.
+
+    A single edit changes at most three trigrams, so a name within distance k of the query
+    must share at least ``len(trigrams(query)) - 3 * k`` trigrams with it. Only names passing
+    that count filter are verified with a bounded edit distance, which keeps lookups far below
+    a brute-force comparison against every scene. Postings are split by name length, so only
+    names whose length is within the allowed distance are counted at all.
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[tuple[str, int], set[str]] = {}
+
+    def add(self, name: str) -> None:
+        for gram in trigrams(name):
+            self._postings.setdefault((gram, len(name)), set()).add(name)
+
+    def remove(self, name: str) -> None:
+        for gram in trigrams(name):
+            key = (gram, len(name))
+            names = self._postings.get(key)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._postings[key]
+
+    def search(self, query: str, max_distance: int, deadline: float) -> tuple[str, int] | None:
+        """
+        Return the closest name within max_distance and its distance.
+
+        Once time.perf_counter() passes the deadline the search gives up: while candidates are still
+        being counted it returns None, while they are verified the closest match verified so far.
+        """
+        query_grams = trigrams(query)
+        min_shared = len(query_grams) - 3 * max_distance
+        if max_distance <= 0 or min_shared <= 0:
+            return None
+        # Candidates bucketed by their number of shared trigrams, which also orders them without a sort
+        candidates: list[list[str]] = [[] for _ in range(len(query_grams) + 1)]
+        for length in range(len(query) - max_distance, len(query) + max_distance + 1):
+            postings = sorted((self._postings.get((gram, length), set()) for gram in query_grams), key=len)
+            # Prefix filter: a name sharing enough trigrams must appear in one of the rarest postings
+            prefix_length = len(postings) - min_shared + 1
+            shared: Counter[str] = Counter()
+            for names in postings[:prefix_length]:
+                for chunk in _chunks(names):
+                    if time.perf_counter() > deadline:
+                        return None
+                    shared.update(chunk)
+            for names in postings[prefix_length:]:
+                # Walk the smaller side; only names counted already are updated, so shared keeps its keys
+                for chunk in _chunks(shared if len(shared) < len(names) else names):
+                    if time.perf_counter() > deadline:
+                        return None
+                    shared.update(name for name in chunk if name in shared and name in names)
+            for chunk in _chunks(shared):
+                if time.perf_counter() > deadline:
+                    return None
+                for name in [name for name in chunk if shared[name] >= min_shared]:
+                    candidates[shared[name]].append(name)
+        # Verify the most promising names first so the distance bound tightens quickly
+        best: tuple[str, int] | None = None
+        for count in range(len(query_grams), min_shared - 1, -1):
+            for name in candidates[count]:
+                limit = best[1] - 1 if best else max_distance
+                if count < len(query_grams) - 3 * limit or time.perf_counter() > deadline:
+                    return best
+                distance = bounded_levenshtein(query, name, limit)
+                if distance is not None:
+                    best = (name, distance)
+        return best
@@ -1,32 +1,116 @@
 import asyncio
+import contextlib
 import pathlib
+import sys
+import time
 from typing import Annotated
 
 import jinja2
 import typer
 from private_assistant_commons import mqtt_connection_handler, skill_config, skill_logger
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlmodel import SQLModel
 
-from private_assistant_scene_skill import scene_skill
+from private_assistant_scene_skill import config, database, scene_io, scene_skill, schema
 
 app = typer.Typer()
+# Bulk scene tools, a separate script so that the skill keeps running as the only command of app
+scenes_app = typer.Typer()
 
 
 @app.command()
 def main(config_path: Annotated[pathlib.Path, typer.Argument(envvar="PRIVATE_ASSISTANT_CONFIG_PATH")]) -> None:
+    """Run the skill with the given configuration."""
     asyncio.run(start_skill(config_path))
 
 
+@scenes_app.command("import")
+def import_command(
+    path: Annotated[pathlib.Path, typer.Argument(help="JSONL or CSV file to import, - for stdin.")],
+    scene_format: Annotated[scene_io.SceneFormat | None, typer.Option("--format")] = None,
+    replace: Annotated[bool, typer.Option(help="Replace existing scenes of the same name.")] = False,
+    batch_size: Annotated[int, typer.Option(min=1)] = scene_io.IMPORT_BATCH_SIZE,
+) -> None:
+    """Import scenes and their devices into the database given by the Postgres environment."""
+    try:
+        asyncio.run(import_scenes(path, scene_io.format_for(path, scene_format), replace, batch_size))
+    except scene_io.SceneImportError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1) from e
+
+
+@scenes_app.command("export")
+def export_command(
+    path: Annotated[pathlib.Path, typer.Argument(help="JSONL or CSV file to write, - for stdout.")] = pathlib.Path("-"),
+    scene_format: Annotated[scene_io.SceneFormat | None, typer.Option("--format")] = None,
+) -> None:
+    """Export all scenes and their devices from the database given by the Postgres environment."""
+    try:
+        scene_format = scene_io.format_for(path, scene_format)
+    except scene_io.SceneImportError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1) from e
+    asyncio.run(export_scenes(path, scene_format))
+
+
+def _open_scene_file(path: pathlib.Path, mode: str) -> contextlib.AbstractContextManager:
+    if str(path) == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    # csv handles line endings itself
+    return path.open(mode, encoding="utf-8", newline="")
+
+
+async def import_scenes(path: pathlib.Path, scene_format: scene_io.SceneFormat, replace: bool, batch_size: int) -> None:
+    logger = skill_logger.SkillLogger.get_logger("Private Assistant SceneSkill")
+    db_engine = create_async_engine(skill_config.PostgresConfig.from_env().connection_string_async)
+    try:
+        await schema.migrate_schema(db_engine, logger)
+        started_at = time.perf_counter()
+        with _open_scene_file(path, "r") as file:
+            scene_count, device_count = await scene_io.import_scenes(
+                db_engine, scene_io.read_scenes(file, scene_format), replace=replace, batch_size=batch_size
+            )
+        logger.info(
+            "Imported %d scene(s) with %d device(s) in %.1f s.",
+            scene_count,
+            device_count,
+            time.perf_counter() - started_at,
+        )
+    finally:
+        await db_engine.dispose()
+
+
+async def export_scenes(path: pathlib.Path, scene_format: scene_io.SceneFormat) -> None:
+    logger = skill_logger.SkillLogger.get_logger("Private Assistant SceneSkill")
+    db_engine = create_async_engine(skill_config.PostgresConfig.from_env().connection_string_async)
+    try:
+        scene_count = 0
+        with _open_scene_file(path, "w") as file:
+            write = scene_io.scene_writer(file, scene_format)
+            async for scene in scene_io.stream_scenes(db_engine):
+                write(scene)
+                scene_count += 1
+        logger.info("Exported %d scene(s).", scene_count)
+    finally:
+        await db_engine.dispose()
+
+
 async def start_skill(
     config_path: pathlib.Path,
 ):
     # Set up logger early on
     logger = skill_logger.SkillLogger.get_logger("Private Assistant SceneSkill")
-    config_obj = skill_config.load_config(config_path, skill_config.SkillConfig)
-    db_engine_async = create_async_engine(skill_config.PostgresConfig.from_env().connection_string_async)
-    async with db_engine_async.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+    config_obj = skill_config.load_config(config_path, config.SkillConfig)
+    db_engine_async = database.create_db_engine(
+        skill_config.PostgresConfig.from_env().connection_string_async, config_obj
+    )
+    try:
+        await schema.migrate_schema(db_engine_async, logger)
+    except (OSError, SQLAlchemyError):
+        if config_obj.scene_snapshot_path is None:
+            raise
+        # The skill serves its scene snapshot and migrates once the database is reachable
+        logger.error("Database unavailable at startup, starting from the scene snapshot.", exc_info=True)
 
     # Set up Jinja2 template environment
     template_env = jinja2.Environment(
@@ -0,0 +1,94 @@
+import time
+
+from pydantic import BaseModel, Field, computed_field
+
+
+class SceneCacheMetrics(BaseModel):
+    swap_count: int = 0
+    failed_refresh_count: int = 0
+    last_refresh_duration_ms: float = 0.0
+    # Lookups of the on-demand device cache, only used with lazy scene devices
+    device_cache_hits: int = 0
+    device_cache_misses: int = 0
+    # Monotonic time the served snapshot was read from the database
+    loaded_at: float = Field(default_factory=time.monotonic, exclude=True)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def staleness_seconds(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def device_cache_hit_ratio(self) -> float:
+        lookups = self.device_cache_hits + self.device_cache_misses
+        return self.device_cache_hits / lookups if lookups else 0.0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def device_cache_miss_ratio(self) -> float:
+        lookups = self.device_cache_hits + self.device_cache_misses
+        return self.device_cache_misses / lookups if lookups else 0.0
+
+    def record_swap(self, loaded_at: float, duration: float) -> None:
+        self.swap_count += 1
+        self.loaded_at = loaded_at
+        self.last_refresh_duration_ms = duration * 1000
+
+
+class PublishMetrics(BaseModel):
+    apply_count: int = 0
+    coalesced_apply_count: int = 0
+    published_devices: int = 0
+    # Publishes skipped because the mirrored device state already matched the scene
+    saved_publishes: int = 0
+    last_apply_duration_ms: float = 0.0
+    # Publishes delayed by a topic prefix rate limit and their summed waiting time
+    throttled_publishes: int = 0
+    throttle_wait_seconds: float = 0.0
+
+    def record_apply(self, devices: int, duration: float) -> None:
+        self.apply_count += 1
+        self.published_devices += devices
+        self.last_apply_duration_ms = duration * 1000
+
+    def record_throttle(self, wait: float) -> None:
+        self.throttled_publishes += 1
+        self.throttle_wait_seconds += wait
+
+
+class DatabasePoolMetrics(BaseModel):
+    # Connections the pool may hand out at once, pool size plus overflow
+    capacity: int = 0
+    checked_out: int = 0
+    max_checked_out: int = 0
+    checkout_count: int = 0
+    checkout_timeout_count: int = 0
+    checkout_wait_ms_total: float = 0.0
+    max_checkout_wait_ms: float = 0.0
+    # Connection churn, opened and closed database connections
+    opened_connections: int = 0
+    closed_connections: int = 0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def saturation(self) -> float:
+        return self.checked_out / self.capacity if self.capacity else 0.0
+
+    def record_checkout_wait(self, wait: float) -> None:
+        self.checkout_wait_ms_total += wait * 1000
+        self.max_checkout_wait_ms = max(self.max_checkout_wait_ms, wait * 1000)
+
+    def record_checkout(self) -> None:
+        self.checkout_count += 1
+        self.checked_out += 1
+        self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+
+class SkillMetrics(BaseModel):
+    """Runtime metrics of the skill, published as JSON on the metrics topic."""
+
+    scene_cache: SceneCacheMetrics = Field(default_factory=SceneCacheMetrics)
+    publish: PublishMetrics = Field(default_factory=PublishMetrics)
+    # Only available when the engine was created by create_db_engine
+    database: DatabasePoolMetrics | None = None
@@ -1,11 +1,36 @@
 import re
+from dataclasses import dataclass
+from datetime import UTC, datetime
 
 from pydantic import field_validator
+from sqlalchemy import false, text
 from sqlmodel import Field, Relationship, SQLModel
 from sqlmodel._compat import SQLModelConfig
 
 # Define a regex pattern for a valid MQTT topic
 MQTT_TOPIC_REGEX = re.compile(r"[\$#\+\s\0-\31]+")  # Disallow '+', '#', whitespace, and control characters
+MQTT_TOPIC_MAX_LENGTH = 128
+
+
+def validate_mqtt_topic(value: str) -> str:
+    """Return the topic, raising ValueError if it does not conform to MQTT standards."""
+    # Check for any invalid characters in the topic
+    if MQTT_TOPIC_REGEX.findall(value):
+        raise ValueError("must not contain '+', '#', whitespace, or control characters.")
+    if len(value) > MQTT_TOPIC_MAX_LENGTH:
+        raise ValueError(f"Topic length exceeds maximum allowed limit ({MQTT_TOPIC_MAX_LENGTH} characters).")
+
+    # Trim any leading or trailing whitespace just in case
+    return value.strip()
+
+
+def utc_now() -> datetime:
+    """Naive UTC timestamp, matching the timezone-less datetime columns."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+# Columns get server defaults matching the model defaults, as scenes are also maintained with plain SQL
+UPDATED_AT_COLUMN_KWARGS = {"onupdate": utc_now, "server_default": text("CURRENT_TIMESTAMP")}
 
 
 class SQLModelValidation(SQLModel):
@@ -19,27 +44,86 @@ class SQLModelValidation(SQLModel):
 class SceneSkillScenes(SQLModelValidation, table=True):
     id: int | None = Field(default=None, primary_key=True)
     name: str
+    # Publish the devices one after another in id order instead of fanning out
+    ordered: bool = Field(default=False, sa_column_kwargs={"server_default": false()})
+    # Seconds to wait between two stages of the scene
+    stage_delay: float = Field(default=0.0, ge=0, sa_column_kwargs={"server_default": "0"})
+    # Row version used by the periodic delta refresh, bumped on every update by a trigger of the schema migration
+    updated_at: datetime = Field(default_factory=utc_now, sa_column_kwargs=UPDATED_AT_COLUMN_KWARGS, index=True)
 
-    devices: list["SceneSkillDevices"] = Relationship(back_populates="scene")
+    devices: list["SceneSkillDevices"] = Relationship(
+        back_populates="scene", sa_relationship_kwargs={"order_by": "SceneSkillDevices.id"}
+    )
 
 
 class SceneSkillDevices(SQLModelValidation, table=True):
     id: int | None = Field(default=None, primary_key=True)
     topic: str
-    scene_payload: str = "ON"
+    scene_payload: str = Field(default="ON", sa_column_kwargs={"server_default": "ON"})
+    qos: int = Field(default=1, ge=0, le=2, sa_column_kwargs={"server_default": "1"})
+    retain: bool = Field(default=False, sa_column_kwargs={"server_default": false()})
+    # Devices of a lower stage are published before this one, devices of one stage concurrently
+    stage: int = Field(default=0, ge=0, sa_column_kwargs={"server_default": "0"})
+    # Name of the device broker from the configuration, None for the skill's own broker
+    broker: str | None = None
+    # Topic the device reports its state on, defaults to the topic plus the configured suffix
+    state_topic: str | None = None
+    updated_at: datetime = Field(default_factory=utc_now, sa_column_kwargs=UPDATED_AT_COLUMN_KWARGS, index=True)
 
     scene_id: int = Field(foreign_key="sceneskillscenes.id")
     scene: SceneSkillScenes = Relationship(back_populates="devices")
 
-    # Validate the topic field to ensure it conforms to MQTT standards
-    @field_validator("topic")
+    # Validate the topic fields to ensure they conform to MQTT standards
+    @field_validator("topic", "state_topic")
+    @classmethod
+    def validate_topic(cls, value: str | None):
+        if value is None:
+            return value
+        return validate_mqtt_topic(value)
+
+
+SCENES_TABLE = SQLModel.metadata.tables[str(SceneSkillScenes.__tablename__)]
+DEVICES_TABLE = SQLModel.metadata.tables[str(SceneSkillDevices.__tablename__)]
+
+
+class SceneSkillSchemaVersion(SQLModel, table=True):
+    """Single row holding the version of the skill's database schema."""
+
+    version: int = Field(primary_key=True)
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceRecord:
+    """
+    Immutable device entry of the scene cache.
+
+    Holds only what is needed to apply a scene, so the cache does not keep ORM instances with
+    their validation and session state alive. The tuple of records of a scene is its publish
+    plan: payloads are encoded once at load time and handed to the MQTT client as they are.
+    """
+
+    topic: str
+    payload: bytes
+    qos: int = 1
+    retain: bool = False
+    # Publishes of a lower stage complete before the next stage starts
+    stage: int = 0
+    # Seconds to wait after the previous stage before publishing this one
+    stage_delay: float = 0.0
+    state_topic: str | None = None
+    broker: str | None = None
+
     @classmethod
-    def validate_topic(cls, value: str):
-        # Check for any invalid characters in the topic
-        if MQTT_TOPIC_REGEX.findall(value):
-            raise ValueError("must not contain '+', '#', whitespace, or control characters.")
-        if len(value) > 128:
-            raise ValueError("Topic length exceeds maximum allowed limit (128 characters).")
-
-        # Trim any leading or trailing whitespace just in case
-        return value.strip()
+    def from_device(
+        cls, device: SceneSkillDevices, stage: int | None = None, stage_delay: float = 0.0
+    ) -> "DeviceRecord":
+        return cls(
+            topic=device.topic,
+            payload=device.scene_payload.encode("utf-8"),
+            qos=device.qos,
+            retain=device.retain,
+            stage=device.stage if stage is None else stage,
+            stage_delay=stage_delay,
+            state_topic=device.state_topic,
+            broker=device.broker,
+        )
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import uuid
+import zlib
+
+import aiomqtt
+
+
+class PublishConnectionPool:
+    """
+    Extra MQTT connections used only for device publishes.
+
+    Keeping the device fan-out off the control connection means large scenes do not queue ahead of
+    intent results and responses. A topic is always published on the same connection, chosen by a
+    stable hash, so the order of publishes to one device is kept. Every connection reconnects on
+    its own, so a failed publish does not disturb the publishes in flight on the others.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        size: int,
+        client_id: str,
+        logger: logging.Logger,
+        retry_interval: float = 5,
+    ) -> None:
+        self.hostname = hostname
+        self.port = port
+        self.size = size
+        # Replicas share the configured client id, a broker drops the older session of a duplicate id
+        self.client_id = f"{client_id}-{uuid.uuid4().hex[:8]}"
+        self.logger = logger
+        self.retry_interval = retry_interval
+        self._clients: list[aiomqtt.Client | None] = [None] * size
+        self._connection_lost = [asyncio.Event() for _ in range(size)]
+
+    def client_for(self, topic: str) -> aiomqtt.Client | None:
+        """Return the pool connection for a topic, or None while that connection is down."""
+        return self._clients[zlib.crc32(topic.encode("utf-8")) % self.size]
+
+    def mark_connection_lost(self, client: aiomqtt.Client) -> None:
+        """Reconnect the pool connection client after a publish on it failed."""
+        for index, pooled in enumerate(self._clients):
+            if pooled is client:
+                self._connection_lost[index].set()
+
+    async def run(self) -> None:
+        """Keep the pool connected until cancelled, reconnecting lost connections."""
+        async with asyncio.TaskGroup() as task_group:
+            for index in range(self.size):
+                task_group.create_task(self._run_connection(index))
+
+    async def _run_connection(self, index: int) -> None:
+        connection_lost = self._connection_lost[index]
+        while True:
+            try:
+                async with aiomqtt.Client(
+                    self.hostname,
+                    port=self.port,
+                    identifier=f"{self.client_id}-publish-{index}",
+                    logger=self.logger,
+                ) as client:
+                    connection_lost.clear()
+                    self._clients[index] = client
+                    self.logger.info("Connected publish connection %d to %s.", index, self.hostname)
+                    try:
+                        await connection_lost.wait()
+                    finally:
+                        self._clients[index] = None
+                self.logger.warning(
+                    "Publish connection %d lost; reconnecting in %s seconds...", index, self.retry_interval
+                )
+            except aiomqtt.MqttError:
+                self.logger.error(
+                    "Publish connection %d failed; retrying in %s seconds...",
+                    index,
+                    self.retry_interval,
+                    exc_info=True,
+                )
+            await asyncio.sleep(self.retry_interval)
@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import logging
+import operator
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+import aiomqtt
+
+from private_assistant_scene_skill.broker_connections import BrokerConnections
+from private_assistant_scene_skill.metrics import PublishMetrics
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.publish_pool import PublishConnectionPool
+from private_assistant_scene_skill.rate_limiter import PublishRateLimiter, TokenBucket
+
+
+@dataclass(slots=True)
+class PublishResult:
+    """
+    Progress of one publish wave, updated while its publishes complete.
+
+    QoS 0 publishes count as acknowledged once handed to the client. Devices neither acknowledged
+    nor failed yet are reported as timed out when the result is read before the wave finished.
+    """
+
+    devices: int
+    acknowledged: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def timed_out(self) -> int:
+        return self.devices - self.acknowledged - self.failed
+
+    @property
+    def elapsed_ms(self) -> float:
+        finished_at = time.perf_counter() if self.finished_at is None else self.finished_at
+        return (finished_at - self.started_at) * 1000
+
+
+class ScenePublisher:
+    """
+    Publishes the devices of applied scenes with a bounded number of publishes in flight.
+
+    Devices are grouped by stage. Stages run one after another, separated by the longest stage
+    delay of the devices in the next stage, and the devices of one stage are published
+    concurrently with at most ``concurrency`` publishes awaiting their acknowledgement.
+    A concurrency of 1 publishes strictly in plan order per broker and rate limit, in one lane per
+    broker and token bucket, so every topic keeps its order. Otherwise QoS 0 devices, which
+    are never acknowledged, are handed to the client first without taking a slot. With a connection
+    pool devices are published on the pool and on mqtt_client only while the pool is not connected.
+    Devices assigned to another broker are published on its connection from brokers.
+
+    Rate limited devices wait for their token before taking a slot, so a saturated bridge does not
+    hold back the devices of other topic prefixes.
+    """
+
+    def __init__(
+        self,
+        mqtt_client: aiomqtt.Client,
+        concurrency: int,
+        metrics: PublishMetrics,
+        logger: logging.Logger,
+        pool: PublishConnectionPool | None = None,
+        rate_limiter: PublishRateLimiter | None = None,
+        brokers: BrokerConnections | None = None,
+    ) -> None:
+        self.mqtt_client = mqtt_client
+        self.concurrency = max(1, concurrency)
+        self.metrics = metrics
+        self.logger = logger
+        self.pool = pool
+        self.rate_limiter = rate_limiter
+        self.brokers = brokers
+
+    async def publish(self, devices: Sequence[DeviceRecord], result: PublishResult | None = None) -> PublishResult:
+        """
+        Publish all devices and return once every publish is acknowledged or failed.
+
+        Progress is recorded in result, which callers can pass in to read it while publishing.
+        """
+        if result is None:
+            result = PublishResult(len(devices))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        by_stage = operator.attrgetter("stage")
+        for index, (_, stage_group) in enumerate(itertools.groupby(sorted(devices, key=by_stage), by_stage)):
+            stage_devices = list(stage_group)
+            delay = max(device.stage_delay for device in stage_devices)
+            if index > 0 and delay > 0:
+                # Only this publish task sleeps, other requests keep being handled meanwhile
+                await asyncio.sleep(delay)
+            if self.concurrency == 1:
+                # A throttled topic prefix only holds back the devices sharing its bucket
+                lanes: dict[tuple[str | None, TokenBucket | None], list[DeviceRecord]] = {}
+                for device in stage_devices:
+                    lanes.setdefault((device.broker, self._bucket_for(device)), []).append(device)
+                await asyncio.gather(*(self._publish_sequentially(lane, result) for lane in lanes.values()))
+                continue
+            pending = []
+            for device in stage_devices:
+                if device.qos == 0 and not self._is_rate_limited(device):
+                    await self._publish(device, result)
+                else:
+                    pending.append(device)
+            if len(pending) == 1:
+                await self._publish_paced(pending[0], result)
+            elif pending:
+                await asyncio.gather(*(self._publish_limited(device, semaphore, result) for device in pending))
+        result.finished_at = time.perf_counter()
+        self.metrics.record_apply(len(devices), result.finished_at - result.started_at)
+        self.logger.info(
+            "Published %d device(s) in %.1f ms, %d failed.", len(devices), result.elapsed_ms, result.failed
+        )
+        return result
+
+    def _bucket_for(self, device: DeviceRecord) -> TokenBucket | None:
+        return self.rate_limiter.bucket_for(device.topic) if self.rate_limiter is not None else None
+
+    def _is_rate_limited(self, device: DeviceRecord) -> bool:
+        return self._bucket_for(device) is not None
+
+    async def _throttle(self, device: DeviceRecord) -> None:
+        if self.rate_limiter is None:
+            return
+        wait = await self.rate_limiter.acquire(device.topic)
+        if wait > 0:
+            self.metrics.record_throttle(wait)
+
+    async def _publish_sequentially(self, devices: Sequence[DeviceRecord], result: PublishResult) -> None:
+        for device in devices:
+            await self._publish_paced(device, result)
+
+    async def _publish_paced(self, device: DeviceRecord, result: PublishResult) -> None:
+        await self._throttle(device)
+        await self._publish(device, result)
+
+    async def _publish_limited(self, device: DeviceRecord, semaphore: asyncio.Semaphore, result: PublishResult) -> None:
+        await self._throttle(device)
+        async with semaphore:
+            await self._publish(device, result)
+
+    async def _publish(self, device: DeviceRecord, result: PublishResult) -> None:
+        self.logger.debug("Sending payload %s to topic %s via MQTT.", device.payload, device.topic)
+        if device.broker is not None:
+            await self._publish_to_broker(device, device.broker, result)
+            return
+        client = self.pool.client_for(device.topic) if self.pool is not None else None
+        try:
+            await (client or self.mqtt_client).publish(
+                device.topic, device.payload, qos=device.qos, retain=device.retain
+            )
+        except aiomqtt.MqttError:
+            if client is not None and self.pool is not None:
+                self.pool.mark_connection_lost(client)
+            result.failed += 1
+            self.logger.error("Publishing to topic %s failed.", device.topic, exc_info=True)
+        else:
+            result.acknowledged += 1
+
+    async def _publish_to_broker(self, device: DeviceRecord, broker: str, result: PublishResult) -> None:
+        if self.brokers is None or broker not in self.brokers:
+            result.failed += 1
+            self.logger.error("Device topic %s refers to unknown broker %s.", device.topic, broker)
+            return
+        try:
+            client = await self.brokers.client_for(broker)
+            await client.publish(device.topic, device.payload, qos=device.qos, retain=device.retain)
+        except aiomqtt.MqttError:
+            await self.brokers.discard(broker)
+            result.failed += 1
+            self.logger.error("Publishing to topic %s on broker %s failed.", device.topic, broker, exc_info=True)
+        else:
+            result.acknowledged += 1
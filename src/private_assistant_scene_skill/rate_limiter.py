@@ -0,0 +1,54 @@
+import asyncio
+import time
+from collections.abc import Mapping
+
+
+class TokenBucket:
+    """
+    Token bucket pacing publishes to rate per second with bursts of up to burst publishes.
+
+    Callers reserve their token up front and sleep until it is due, so concurrent publishes are
+    spread evenly instead of racing for the next token.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        # Time at which the bucket is refilled completely
+        self._full_at = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return the seconds to wait until it may be used."""
+        full_at = max(self._full_at, now)
+        wait = max(0.0, full_at - now - (self.burst - 1) / self.rate)
+        self._full_at = full_at + 1 / self.rate
+        return wait
+
+    async def acquire(self) -> float:
+        """Wait for a token and return the seconds waited."""
+        wait = self.reserve(time.monotonic())
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class PublishRateLimiter:
+    """Token buckets for device publishes keyed by topic prefix, the longest matching prefix wins."""
+
+    def __init__(self, limits: Mapping[str, float]) -> None:
+        self._buckets = {
+            prefix: TokenBucket(rate) for prefix, rate in sorted(limits.items(), key=lambda item: -len(item[0]))
+        }
+
+    def bucket_for(self, topic: str) -> TokenBucket | None:
+        for prefix, bucket in self._buckets.items():
+            if topic.startswith(prefix):
+                return bucket
+        return None
+
+    async def acquire(self, topic: str) -> float:
+        """Wait until topic may be published and return the seconds waited."""
+        bucket = self.bucket_for(topic)
+        if bucket is None:
+            return 0.0
+        return await bucket.acquire()
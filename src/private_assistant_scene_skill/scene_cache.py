@@ -0,0 +1,295 @@
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+
+from sqlalchemy import Row, Select, select
+
+from private_assistant_scene_skill.fuzzy_index import TrigramIndex
+from private_assistant_scene_skill.metrics import SceneCacheMetrics
+from private_assistant_scene_skill.models import DEVICES_TABLE, SCENES_TABLE, DeviceRecord
+from private_assistant_scene_skill.scene_trie import SceneTrie, tokenize
+
+# Ordered publishes that apply a scene, compiled once when the scene is cached
+PublishPlan = tuple[DeviceRecord, ...]
+# Device columns of the rows selected by scene_rows_query, after the scene id, name, ordered and stage delay
+SCENE_ROW_DEVICE_COLUMNS = ("topic", "scene_payload", "qos", "retain", "stage", "state_topic", "broker")
+
+
+def _device_stages(ordered: bool, stage_delay: float, stages: Sequence[int]) -> list[tuple[int, float]]:
+    stages = list(range(len(stages))) if ordered else stages
+    first_stage = min(stages, default=0)
+    return [(stage, stage_delay if stage > first_stage else 0.0) for stage in stages]
+
+
+def scene_rows_query(with_devices: bool = True) -> Select:
+    """
+    Select the columns the cache is built from, without loading ORM instances.
+
+    With devices there is one row per device, ordered by scene and device id, and a row without
+    device columns for scenes that have no devices. Otherwise there is one row per scene.
+    """
+    scene_columns = (SCENES_TABLE.c.id, SCENES_TABLE.c.name, SCENES_TABLE.c.ordered, SCENES_TABLE.c.stage_delay)
+    if not with_devices:
+        return select(*scene_columns)
+    return (
+        select(*scene_columns, *(DEVICES_TABLE.c[column] for column in SCENE_ROW_DEVICE_COLUMNS))
+        .select_from(SCENES_TABLE.outerjoin(DEVICES_TABLE))
+        .order_by(SCENES_TABLE.c.id, DEVICES_TABLE.c.id)
+    )
+
+
+def merge_publish_plans(plans: Sequence[PublishPlan], last_wins: bool = True) -> list[DeviceRecord]:
+    """
+    Merge the plans of several scenes so that every topic of a broker is published only once.
+
+    With last_wins the device of the last plan addressing a topic is kept, otherwise the first.
+    """
+    if len(plans) == 1:
+        return list(plans[0])
+    merged: dict[tuple[str | None, str], DeviceRecord] = {}
+    for plan in plans:
+        for device in plan:
+            key = (device.broker, device.topic)
+            if last_wins or key not in merged:
+                merged[key] = device
+    return list(merged.values())
+
+
+def normalize_scene_name(name: str) -> str:
+    """Normalize a scene name or noun for lookups (case and whitespace insensitive)."""
+    return " ".join(name.lower().split())
+
+
+class SceneCache:
+    """
+    In-memory snapshot of all scenes and their devices as immutable device records.
+
+    Besides the scene name to devices mapping the cache keeps an inverted index from the
+    normalized scene name to the stored name, so resolving nouns to scenes does not depend
+    on the number of cached scenes. Multi-word scene names are matched through a token trie and
+    misheard names through a trigram index.
+    """
+
+    def __init__(self, scenes: Mapping[str, Sequence[DeviceRecord]] | None = None) -> None:
+        self._scenes: dict[str, PublishPlan] = {}
+        self._index: dict[str, str] = {}
+        self._trie = SceneTrie()
+        self._fuzzy_index = TrigramIndex()
+        self._names_by_id: dict[int, str] = {}
+        for name, devices in (scenes or {}).items():
+            self.set_scene(name, devices)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._scenes
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._scenes)
+
+    def __len__(self) -> int:
+        return len(self._scenes)
+
+    def __getitem__(self, name: str) -> PublishPlan:
+        return self._scenes[name]
+
+    def devices(self) -> Iterator[DeviceRecord]:
+        """Iterate over the devices of all cached scenes."""
+        for plan in self._scenes.values():
+            yield from plan
+
+    def set_scene(self, name: str, devices: Sequence[DeviceRecord], scene_id: int | None = None) -> None:
+        """Add or replace a scene and keep the name index in sync."""
+        self._scenes[name] = tuple(devices)
+        if scene_id is not None:
+            self._names_by_id[scene_id] = name
+        normalized = normalize_scene_name(name)
+        self._index[normalized] = name
+        self._trie.add(name)
+        self._fuzzy_index.add(normalized)
+
+    def remove_scene(self, name: str) -> None:
+        """Remove a scene if present and drop its index entry."""
+        if self._scenes.pop(name, None) is not None:
+            self._trie.remove(name)
+            normalized = normalize_scene_name(name)
+            if self._index.get(normalized) == name:
+                del self._index[normalized]
+                self._fuzzy_index.remove(normalized)
+
+    def update_scenes(self, scene_ids: Iterable[int], loaded: "SceneCache") -> list[str]:
+        """
+        Replace the cached entries of the given scene ids with the scenes of a freshly loaded cache.
+
+        Ids without a loaded scene were deleted and are dropped, renamed scenes lose their old name.
+        Returns the old and new names of all affected scenes.
+        """
+        affected = []
+        for scene_id in scene_ids:
+            old_name = self._names_by_id.pop(scene_id, None)
+            if old_name is not None:
+                self.remove_scene(old_name)
+                affected.append(old_name)
+        for name, scene_id in loaded.scene_ids().items():
+            self.set_scene(name, loaded[name], scene_id=scene_id)
+            affected.append(name)
+        return affected
+
+    def scene_ids(self) -> dict[str, int]:
+        """Return the database id of every cached scene loaded from the database."""
+        return {name: scene_id for scene_id, name in self._names_by_id.items()}
+
+    def device_counts(self) -> dict[int, int]:
+        """Return the number of cached devices per scene id."""
+        return {scene_id: len(self._scenes[name]) for scene_id, name in self._names_by_id.items()}
+
+    def match(self, nouns: list[str], text: str = "") -> list[str]:
+        """
+        Find all scenes named in the raw text or the nouns in the order they were said.
+
+        Longer names are preferred, so "movie night" wins over a scene called "movie". Multi-word
+        scenes are found anywhere in the text, single-word scenes only where the word is a noun, so
+        common words such as "all" or "off" do not apply scenes of that name. Scenes named by nouns
+        that do not occur in the text follow in noun order. Matches never span two nouns, and a noun
+        whose words are covered by an earlier match adds nothing.
+        """
+        text_tokens = tokenize(text)
+        noun_tokens = [tokenize(noun) for noun in nouns]
+        noun_words = {token for tokens in noun_tokens for token in tokens}
+        found: list[str] = []
+        covered: set[str] = set()
+        for start, end, name in self._trie.find(text_tokens):
+            if end - start == 1 and text_tokens[start] not in noun_words:
+                continue
+            if name not in found:
+                found.append(name)
+            covered.update(text_tokens[start:end])
+        for tokens in noun_tokens:
+            for start, end, name in self._trie.find(tokens):
+                if name not in found and not covered.issuperset(tokens[start:end]):
+                    found.append(name)
+                covered.update(tokens[start:end])
+        return found
+
+    def fuzzy_match(self, nouns: list[str], text: str, max_distance: int, time_budget_ms: float) -> list[str]:
+        """
+        Find scenes whose names are within max_distance edits of a noun or a word sequence of the text.
+
+        The allowed distance shrinks for short words (one edit per four characters) to avoid
+        matching unrelated scenes. The search stops once the time budget is used up.
+        """
+        deadline = time.perf_counter() + time_budget_ms / 1000
+        text_tokens = tokenize(text)
+        queries = [normalize_scene_name(noun) for noun in nouns]
+        # Like exact matches, the raw text is only searched for multi-word scenes
+        for length in range(2, self._trie.max_depth + 1):
+            queries += [" ".join(text_tokens[i : i + length]) for i in range(len(text_tokens) - length + 1)]
+        found: list[str] = []
+        for query in dict.fromkeys(queries):
+            if time.perf_counter() > deadline:
+                break
+            result = self._fuzzy_index.search(query, min(max_distance, len(query) // 4), deadline)
+            if result is not None:
+                scene_name = self._index[result[0]]
+                if scene_name not in found:
+                    found.append(scene_name)
+        return found
+
+
+class SceneCacheLoader:
+    """
+    Builds a SceneCache from the rows of scene_rows_query while they are streamed in batches.
+
+    Rows become device records directly. The rows of a scene are consecutive but may span batches,
+    so a scene is compiled once the first row of the next scene arrives or the loader finishes.
+    """
+
+    def __init__(self, with_devices: bool = True) -> None:
+        self.with_devices = with_devices
+        self._cache = SceneCache()
+        self._scene: Row | None = None
+        self._devices: list[Row] = []
+
+    def add_rows(self, rows: Iterable[Row]) -> None:
+        for row in rows:
+            if self._scene is None or row[0] != self._scene[0]:
+                self._add_scene()
+                self._scene = row
+            if self.with_devices and row[4] is not None:
+                self._devices.append(row)
+
+    def finish(self) -> SceneCache:
+        """Add the last scene and return the cache."""
+        self._add_scene()
+        self._scene = None
+        return self._cache
+
+    def _add_scene(self) -> None:
+        if self._scene is None:
+            return
+        scene_id, name, ordered, stage_delay = self._scene[:4]
+        # Device columns follow the four scene columns, in the order of SCENE_ROW_DEVICE_COLUMNS
+        devices = [row[4:] for row in self._devices]
+        stages = _device_stages(ordered, stage_delay, [device[4] for device in devices])
+        plan = tuple(
+            DeviceRecord(
+                topic=topic,
+                payload=scene_payload.encode("utf-8"),
+                qos=qos,
+                retain=retain,
+                stage=stage,
+                stage_delay=device_stage_delay,
+                state_topic=state_topic,
+                broker=broker,
+            )
+            for (stage, device_stage_delay), (topic, scene_payload, qos, retain, _, state_topic, broker) in zip(
+                stages, devices, strict=True
+            )
+        )
+        self._cache.set_scene(name, plan, scene_id=scene_id)
+        self._devices = []
+
+
+class SceneDeviceLRU:
+    """
+    Size-bounded cache of publish plans for scenes whose devices are loaded on demand.
+
+    Used instead of keeping every plan in the SceneCache when the catalog is too large for memory.
+    Lookups are counted as hits and misses in the given metrics.
+    """
+
+    def __init__(self, max_scenes: int, metrics: SceneCacheMetrics) -> None:
+        self.max_scenes = max_scenes
+        self.metrics = metrics
+        self._plans: OrderedDict[str, PublishPlan] = OrderedDict()
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._plans
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, name: str) -> PublishPlan | None:
+        """Return the cached plan of a scene and mark it as recently used."""
+        plan = self._plans.get(name)
+        if plan is None:
+            self.metrics.device_cache_misses += 1
+            return None
+        self.metrics.device_cache_hits += 1
+        self._plans.move_to_end(name)
+        return plan
+
+    def put(self, name: str, plan: PublishPlan) -> None:
+        self._plans[name] = plan
+        self._plans.move_to_end(name)
+        while len(self._plans) > self.max_scenes:
+            self._plans.popitem(last=False)
+
+    def discard(self, names: Iterable[str]) -> None:
+        for name in names:
+            self._plans.pop(name, None)
+
+    def clear(self) -> None:
+        self._plans.clear()
+
+    def device_counts(self, scene_ids: Mapping[str, int]) -> dict[int, int]:
+        """Return the number of cached devices per scene id for the scenes in the cache."""
+        return {scene_ids[name]: len(plan) for name, plan in self._plans.items() if name in scene_ids}
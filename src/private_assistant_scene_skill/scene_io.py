@@ -0,0 +1,297 @@
+import collections
+import csv
+import enum
+import itertools
+import operator
+import pathlib
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from typing import Any, TextIO
+
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from private_assistant_scene_skill.models import (
+    DEVICES_TABLE,
+    MQTT_TOPIC_MAX_LENGTH,
+    MQTT_TOPIC_REGEX,
+    SCENES_TABLE,
+    utc_now,
+    validate_mqtt_topic,
+)
+
+DEVICE_COLUMNS = ("topic", "scene_payload", "qos", "retain", "stage", "broker", "state_topic")
+# One CSV row per device, repeating the scene columns; a scene without devices has an empty topic
+CSV_COLUMNS = ("scene", "ordered", "stage_delay", *DEVICE_COLUMNS)
+# Devices written per statement or COPY, scenes are never split across batches
+IMPORT_BATCH_SIZE = 10_000
+EXPORT_BATCH_SIZE = 10_000
+MAX_REPORTED_ERRORS = 20
+
+
+class SceneFormat(enum.Enum):
+    JSONL = "jsonl"
+    CSV = "csv"
+
+
+class SceneImportError(ValueError):
+    """Raised for import files that do not parse or contain invalid topics or names, nothing is imported."""
+
+
+class DeviceEntry(BaseModel):
+    topic: str
+    scene_payload: str = "ON"
+    qos: int = Field(default=1, ge=0, le=2)
+    retain: bool = False
+    stage: int = Field(default=0, ge=0)
+    broker: str | None = None
+    state_topic: str | None = None
+
+
+class SceneEntry(BaseModel):
+    """A scene with its devices as stored in JSONL and CSV files."""
+
+    name: str
+    ordered: bool = False
+    stage_delay: float = Field(default=0.0, ge=0)
+    devices: list[DeviceEntry] = []
+
+
+def format_for(path: pathlib.Path, scene_format: SceneFormat | None = None) -> SceneFormat:
+    """Return scene_format, or the format matching the suffix of path, JSONL for stdin."""
+    if scene_format is not None:
+        return scene_format
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return SceneFormat.CSV
+    if suffix in (".jsonl", ".ndjson") or str(path) == "-":
+        return SceneFormat.JSONL
+    raise SceneImportError(f"Cannot tell the format of {path}, pass it explicitly.")
+
+
+def read_jsonl(file: TextIO) -> Iterator[SceneEntry]:
+    """Yield the scenes of a JSONL file, one scene with its devices per line."""
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield SceneEntry.model_validate_json(line)
+        except ValidationError as e:
+            raise SceneImportError(f"Line {line_number}: {e}") from e
+
+
+def read_csv(file: TextIO) -> Iterator[SceneEntry]:
+    """Yield the scenes of a CSV file, whose consecutive rows of one scene are grouped."""
+    reader = csv.DictReader(file)
+    for name, rows in itertools.groupby(reader, key=operator.itemgetter("scene")):
+        first, *others = rows
+        try:
+            yield SceneEntry.model_validate(
+                {
+                    "name": name,
+                    "ordered": first["ordered"] or False,
+                    "stage_delay": first["stage_delay"] or 0.0,
+                    # Empty cells fall back to the column defaults
+                    "devices": [
+                        {column: row[column] for column in DEVICE_COLUMNS if row.get(column)}
+                        for row in (first, *others)
+                        if row.get("topic")
+                    ],
+                }
+            )
+        except ValidationError as e:
+            raise SceneImportError(f"Line {reader.line_num}: {e}") from e
+
+
+def read_scenes(file: TextIO, scene_format: SceneFormat) -> Iterator[SceneEntry]:
+    return read_csv(file) if scene_format is SceneFormat.CSV else read_jsonl(file)
+
+
+def write_jsonl(file: TextIO) -> Callable[[SceneEntry], None]:
+    def write(scene: SceneEntry) -> None:
+        file.write(scene.model_dump_json(exclude_none=True))
+        file.write("\n")
+
+    return write
+
+
+def write_csv(file: TextIO) -> Callable[[SceneEntry], None]:
+    writer = csv.writer(file)
+    writer.writerow(CSV_COLUMNS)
+
+    def write(scene: SceneEntry) -> None:
+        scene_columns = (scene.name, scene.ordered, scene.stage_delay)
+        if not scene.devices:
+            writer.writerow(scene_columns)
+        writer.writerows(
+            (*scene_columns, *(getattr(device, column) for column in DEVICE_COLUMNS)) for device in scene.devices
+        )
+
+    return write
+
+
+def scene_writer(file: TextIO, scene_format: SceneFormat) -> Callable[[SceneEntry], None]:
+    return write_csv(file) if scene_format is SceneFormat.CSV else write_jsonl(file)
+
+
+def invalid_topics(scenes: Iterable[SceneEntry]) -> list[str]:
+    """
+    Return a description of every invalid device topic of scenes.
+
+    The topics are checked in bulk first: as the disallowed characters form a character class, their
+    concatenation only matches if one of them does. Topics are checked one by one only then.
+    """
+    topics = [
+        (scene.name, topic)
+        for scene in scenes
+        for device in scene.devices
+        for topic in (device.topic, device.state_topic)
+        if topic is not None
+    ]
+    if not topics:
+        return []
+    if not MQTT_TOPIC_REGEX.search("".join(topic for _, topic in topics)) and (
+        max(len(topic) for _, topic in topics) <= MQTT_TOPIC_MAX_LENGTH
+    ):
+        return []
+    errors = []
+    for name, topic in topics:
+        try:
+            validate_mqtt_topic(topic)
+        except ValueError as e:
+            errors.append(f"Scene {name}, topic {topic!r}: {e}")
+    return errors
+
+
+def _batches(scenes: Iterable[SceneEntry], batch_size: int) -> Iterator[list[SceneEntry]]:
+    batch: list[SceneEntry] = []
+    device_count = 0
+    for scene in scenes:
+        batch.append(scene)
+        device_count += len(scene.devices)
+        if device_count >= batch_size:
+            yield batch
+            batch, device_count = [], 0
+    if batch:
+        yield batch
+
+
+async def _delete_scenes(conn: AsyncConnection, names: set[str]) -> None:
+    scene_ids = select(SCENES_TABLE.c.id).where(SCENES_TABLE.c.name.in_(names)).scalar_subquery()
+    await conn.execute(delete(DEVICES_TABLE).where(DEVICES_TABLE.c.scene_id.in_(scene_ids)))
+    await conn.execute(delete(SCENES_TABLE).where(SCENES_TABLE.c.name.in_(names)))
+
+
+async def _existing_names(conn: AsyncConnection, names: list[str]) -> list[str]:
+    query = select(SCENES_TABLE.c.name).where(SCENES_TABLE.c.name.in_(names)).distinct().order_by(SCENES_TABLE.c.name)
+    return list((await conn.execute(query)).scalars())
+
+
+async def _copy_devices(conn: AsyncConnection, rows: list[dict[str, Any]]) -> None:
+    driver_connection = (await conn.get_raw_connection()).driver_connection
+    if driver_connection is None:
+        raise ConnectionError("No driver connection available for COPY.")
+    columns = list(rows[0])
+    # The raw connection runs inside the transaction of conn
+    await driver_connection.copy_records_to_table(
+        DEVICES_TABLE.name, records=[tuple(row.values()) for row in rows], columns=columns
+    )
+
+
+async def import_scenes(
+    db_engine: AsyncEngine,
+    scenes: Iterable[SceneEntry],
+    replace: bool = False,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> tuple[int, int]:
+    """
+    Import scenes with their devices in one transaction and return the number of scenes and devices.
+
+    Scenes are read and written in batches of about batch_size devices. Devices are loaded with COPY
+    on Postgres and with one executemany per batch otherwise. Scene names must be unique in the
+    import and, unless replace deletes the existing scenes of the same name first, in the database.
+    An invalid topic or name raises SceneImportError and imports nothing.
+    """
+    copy = db_engine.dialect.name == "postgresql"
+    updated_at = utc_now()
+    imported_names: set[str] = set()
+    scene_count = device_count = 0
+    async with db_engine.begin() as conn:
+        for batch in _batches(scenes, batch_size):
+            errors = invalid_topics(batch)
+            if errors:
+                shown = "\n".join(errors[:MAX_REPORTED_ERRORS])
+                raise SceneImportError(f"{len(errors)} invalid topic(s), nothing was imported:\n{shown}")
+            names = [scene.name for scene in batch]
+            duplicates = sorted({name for name, count in collections.Counter(names).items() if count > 1})
+            duplicates += sorted(imported_names.intersection(names))
+            if duplicates:
+                raise SceneImportError(
+                    f"Scenes named more than once, nothing was imported: {', '.join(duplicates[:MAX_REPORTED_ERRORS])}"
+                )
+            if replace:
+                await _delete_scenes(conn, set(names))
+            else:
+                existing = await _existing_names(conn, names)
+                if existing:
+                    raise SceneImportError(
+                        f"Scenes already exist, nothing was imported (use replace): "
+                        f"{', '.join(existing[:MAX_REPORTED_ERRORS])}"
+                    )
+            imported_names.update(names)
+            scene_ids = (
+                await conn.execute(
+                    insert(SCENES_TABLE).returning(SCENES_TABLE.c.id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "name": scene.name,
+                            "ordered": scene.ordered,
+                            "stage_delay": scene.stage_delay,
+                            "updated_at": updated_at,
+                        }
+                        for scene in batch
+                    ],
+                )
+            ).scalars()
+            rows = [
+                {**device.model_dump(), "scene_id": scene_id, "updated_at": updated_at}
+                for scene, scene_id in zip(batch, scene_ids, strict=True)
+                for device in scene.devices
+            ]
+            if rows and copy:
+                await _copy_devices(conn, rows)
+            elif rows:
+                await conn.execute(insert(DEVICES_TABLE), rows)
+            scene_count += len(batch)
+            device_count += len(rows)
+    return scene_count, device_count
+
+
+async def stream_scenes(db_engine: AsyncEngine, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[SceneEntry]:
+    """Yield all scenes with their devices, fetching batch_size rows of one joined query at a time."""
+    query = (
+        select(
+            SCENES_TABLE.c.id.label("scene_id"),
+            SCENES_TABLE.c.name,
+            SCENES_TABLE.c.ordered,
+            SCENES_TABLE.c.stage_delay,
+            *(DEVICES_TABLE.c[column] for column in DEVICE_COLUMNS),
+        )
+        .select_from(SCENES_TABLE.outerjoin(DEVICES_TABLE))
+        .order_by(SCENES_TABLE.c.id, DEVICES_TABLE.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async with db_engine.connect() as conn:
+        scene: SceneEntry | None = None
+        scene_id = None
+        async for row in await conn.stream(query):
+            if scene is None or row.scene_id != scene_id:
+                if scene is not None:
+                    yield scene
+                scene_id = row.scene_id
+                scene = SceneEntry(name=row.name, ordered=row.ordered, stage_delay=row.stage_delay)
+            if row.topic is not None:
+                # Rows come from validated columns, so the devices skip validation
+                scene.devices.append(DeviceEntry.model_construct(**dict(zip(DEVICE_COLUMNS, row[4:], strict=True))))
+        if scene is not None:
+            yield scene
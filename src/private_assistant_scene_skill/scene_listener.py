@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+SCENE_CHANGE_CHANNEL = "sceneskill_scene_changed"
+
+# Notify the changed scene id for every write on scenes and devices. Postgres folds identical
+# notifications of one transaction, so bulk edits of a scene arrive as a single id.
+SCENE_TRIGGER_STATEMENTS = [
+    f"""
+    CREATE OR REPLACE FUNCTION sceneskill_notify_scene_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'sceneskillscenes' THEN
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM pg_notify('{SCENE_CHANGE_CHANNEL}', OLD.id::text);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                PERFORM pg_notify('{SCENE_CHANGE_CHANNEL}', NEW.id::text);
+            END IF;
+        ELSE
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM pg_notify('{SCENE_CHANGE_CHANNEL}', OLD.scene_id::text);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                PERFORM pg_notify('{SCENE_CHANGE_CHANNEL}', NEW.scene_id::text);
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS sceneskillscenes_notify ON sceneskillscenes",
+    """
+    CREATE TRIGGER sceneskillscenes_notify AFTER INSERT OR UPDATE OR DELETE ON sceneskillscenes
+    FOR EACH ROW EXECUTE FUNCTION sceneskill_notify_scene_change()
+    """,
+    "DROP TRIGGER IF EXISTS sceneskilldevices_notify ON sceneskilldevices",
+    """
+    CREATE TRIGGER sceneskilldevices_notify AFTER INSERT OR UPDATE OR DELETE ON sceneskilldevices
+    FOR EACH ROW EXECUTE FUNCTION sceneskill_notify_scene_change()
+    """,
+]
+
+# Queued instead of a scene id when the listening connection terminates
+_CONNECTION_LOST = -1
+
+
+async def install_scene_triggers(conn: AsyncConnection) -> None:
+    """Create or replace the Postgres triggers that publish scene changes."""
+    for statement in SCENE_TRIGGER_STATEMENTS:
+        await conn.execute(text(statement))
+
+
+class SceneChangeListener:
+    """
+    Waits for scene change notifications on a dedicated asyncpg connection.
+
+    Notifications arriving within batch_window seconds are handed to on_change as one set of
+    scene ids. After the connection was lost on_resync is awaited once reconnected, because
+    notifications sent in the meantime are gone.
+    """
+
+    def __init__(
+        self,
+        db_engine: AsyncEngine,
+        on_change: Callable[[set[int]], Awaitable[None]],
+        on_resync: Callable[[], Awaitable[None]],
+        logger: logging.Logger,
+        batch_window: float = 0.05,
+        retry_interval: float = 5,
+    ) -> None:
+        self.db_engine = db_engine
+        self.on_change = on_change
+        self.on_resync = on_resync
+        self.logger = logger
+        self.batch_window = batch_window
+        self.retry_interval = retry_interval
+        # Queue and driver connection of the current connection, replaced on every reconnect so that
+        # callbacks of a closed connection cannot reach the next one
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._connection: object | None = None
+
+    def _on_notification(self, connection, _pid: int, _channel: str, payload: str) -> None:
+        if connection is not self._connection:
+            return
+        try:
+            self._queue.put_nowait(int(payload))
+        except ValueError:
+            self.logger.warning("Ignoring scene change notification with invalid payload %r.", payload)
+
+    def _on_termination(self, connection) -> None:
+        if connection is self._connection:
+            self._queue.put_nowait(_CONNECTION_LOST)
+
+    async def _next_batch(self) -> set[int]:
+        scene_ids = {await self._queue.get()}
+        await asyncio.sleep(self.batch_window)
+        while not self._queue.empty():
+            scene_ids.add(self._queue.get_nowait())
+        if _CONNECTION_LOST in scene_ids:
+            raise ConnectionError("Scene change listener connection terminated.")
+        return scene_ids
+
+    async def run(self) -> None:
+        connected_before = False
+        while True:
+            try:
+                async with self.db_engine.connect() as conn:
+                    driver_connection = (await conn.get_raw_connection()).driver_connection
+                    if driver_connection is None:
+                        raise ConnectionError("No driver connection available for scene change listener.")
+                    self._queue = asyncio.Queue()
+                    self._connection = driver_connection
+                    await driver_connection.add_listener(SCENE_CHANGE_CHANNEL, self._on_notification)
+                    driver_connection.add_termination_listener(self._on_termination)
+                    self.logger.info("Listening for scene changes on channel %s.", SCENE_CHANGE_CHANNEL)
+                    try:
+                        if connected_before:
+                            await self.on_resync()
+                        connected_before = True
+                        while True:
+                            scene_ids = await self._next_batch()
+                            self.logger.debug("Received changes for scene ids %s.", scene_ids)
+                            await self.on_change(scene_ids)
+                    finally:
+                        self._connection = None
+                        # Closing the connection must not queue a termination for the next one
+                        driver_connection.remove_termination_listener(self._on_termination)
+                        # Never hand a connection with registered listeners back to the pool
+                        await conn.invalidate()
+            except (OSError, SQLAlchemyError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                self.logger.error(
+                    "Scene change listener lost its connection; retrying in %s seconds...",
+                    self.retry_interval,
+                    exc_info=True,
+                )
+                await asyncio.sleep(self.retry_interval)
@@ -1,21 +1,51 @@
 import asyncio
+import collections
+import time
+from collections.abc import Iterable
+from datetime import datetime, timedelta
 from enum import Enum
 
 import aiomqtt
 import jinja2
 import private_assistant_commons as commons
 from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncEngine
-from sqlalchemy.orm import selectinload
-from sqlmodel import select
+from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from private_assistant_scene_skill.models import SceneSkillDevices, SceneSkillScenes
+from private_assistant_scene_skill import config, database, schema
+from private_assistant_scene_skill.broker_connections import BrokerConnections
+from private_assistant_scene_skill.metrics import SkillMetrics
+from private_assistant_scene_skill.models import SCENES_TABLE, DeviceRecord, SceneSkillDevices, SceneSkillScenes
+from private_assistant_scene_skill.publish_pool import PublishConnectionPool
+from private_assistant_scene_skill.publisher import PublishResult, ScenePublisher
+from private_assistant_scene_skill.rate_limiter import PublishRateLimiter
+from private_assistant_scene_skill.scene_cache import (
+    PublishPlan,
+    SceneCache,
+    SceneCacheLoader,
+    SceneDeviceLRU,
+    merge_publish_plans,
+    scene_rows_query,
+)
+from private_assistant_scene_skill.scene_listener import SceneChangeListener
+from private_assistant_scene_skill.scene_snapshot import read_snapshot, write_snapshot
+from private_assistant_scene_skill.state_mirror import StateMirror
+
+SCENE_KEYWORDS = ["scenery", "scene", "scenario"]
+# Seconds between attempts to reconcile a warm-started scene cache with the database
+SCENE_RECONCILE_RETRY_INTERVAL = 5
+# Rows fetched per round trip while streaming all scenes into a new cache
+SCENE_LOAD_BATCH_SIZE = 10_000
+# Delta refreshes look back this far behind the watermark to catch rows of transactions still open at the last refresh
+DELTA_REFRESH_OVERLAP = timedelta(seconds=5)
 
 
 class Parameters(BaseModel):
     scene_names: list[str] = []
-    devices: list[SceneSkillDevices] = []
+    devices: list[DeviceRecord] = []
 
 
 class Action(Enum):
@@ -34,7 +64,7 @@ class Action(Enum):
 class SceneSkill(commons.BaseSkill):
     def __init__(
         self,
-        config_obj: commons.SkillConfig,
+        config_obj: config.SkillConfig,
         mqtt_client: aiomqtt.Client,
         db_engine: AsyncEngine,
         template_env: jinja2.Environment,
@@ -42,11 +72,53 @@ class SceneSkill(commons.BaseSkill):
         logger,
     ) -> None:
         super().__init__(config_obj, mqtt_client, task_group, logger=logger)
+        self.config_obj: config.SkillConfig = config_obj
         self.db_engine = db_engine
         self.template_env: jinja2.Environment = template_env
         self.action_to_template: dict[Action, jinja2.Template] = {}
 
-        self._scene_cache: dict[str, list[SceneSkillDevices]] = {}
+        self._scene_cache: SceneCache = SceneCache()
+        self._scene_watermark: datetime | None = None
+        self._scene_reload_task: asyncio.Task | None = None
+        # Scene ids patched while a full reload is running, re-applied after the swap
+        self._scene_ids_patched_during_reload: set[int] | None = None
+        # Start times of recent publish waves by applied scene set, for coalescing repeated applies
+        self._recent_publish_waves: dict[frozenset[str], float] = {}
+        self.metrics = SkillMetrics(database=database.pool_metrics(db_engine))
+        # Devices of applied scenes when only scene names are cached, and how often each scene was applied
+        self.scene_devices: SceneDeviceLRU | None = None
+        if self.config_obj.lazy_scene_devices:
+            self.scene_devices = SceneDeviceLRU(self.config_obj.scene_device_cache_size, self.metrics.scene_cache)
+        self._scene_apply_counts: collections.Counter[str] = collections.Counter()
+        self.state_mirror: StateMirror | None = None
+        if self.config_obj.state_mirror_enabled:
+            self.state_mirror = StateMirror(self.config_obj.state_topic_suffix, logger=self.logger)
+        self.publish_pool: PublishConnectionPool | None = None
+        if self.config_obj.publish_pool_size > 0:
+            self.publish_pool = PublishConnectionPool(
+                self.config_obj.mqtt_server_host,
+                self.config_obj.mqtt_server_port,
+                size=self.config_obj.publish_pool_size,
+                client_id=self.config_obj.client_id,
+                logger=self.logger,
+            )
+        self.brokers: BrokerConnections | None = None
+        if self.config_obj.device_brokers:
+            self.brokers = BrokerConnections(
+                self.config_obj.device_brokers, client_id=self.config_obj.client_id, logger=self.logger
+            )
+        self.rate_limiter: PublishRateLimiter | None = None
+        if self.config_obj.publish_rate_limits:
+            self.rate_limiter = PublishRateLimiter(self.config_obj.publish_rate_limits)
+        self.publisher = ScenePublisher(
+            mqtt_client,
+            concurrency=self.config_obj.publish_concurrency,
+            metrics=self.metrics.publish,
+            logger=self.logger,
+            pool=self.publish_pool,
+            rate_limiter=self.rate_limiter,
+            brokers=self.brokers,
+        )
 
     def _load_templates(self) -> None:
         try:
@@ -57,65 +129,384 @@ class SceneSkill(commons.BaseSkill):
             self.logger.error("Failed to load template: %s", e)
 
     async def load_scene_cache(self) -> None:
-        """Asynchronously load devices into the cache."""
-        if not self._scene_cache:
-            self.logger.debug("Loading devices into cache asynchronously.")
+        """
+        Asynchronously load devices into the cache.
+
+        With a scene snapshot the cache is filled from it first and reconciled with the database in
+        the background, so the skill answers without waiting for the database.
+        """
+        if self._scene_cache:
+            return
+        if self.load_scene_snapshot():
+            self._scene_reload_task = self.add_task(self.reconcile_scene_cache())
+            await self.subscribe_state_topics()
+        else:
+            await self.reload_scene_cache()
+
+    def load_scene_snapshot(self) -> bool:
+        """Fill the cache from the configured snapshot and return whether one was found."""
+        path = self.config_obj.scene_snapshot_path
+        if path is None:
+            return False
+        try:
+            snapshot = read_snapshot(path, with_devices=self.scene_devices is None)
+        except (OSError, ValueError):
+            self.logger.warning("Ignoring unreadable scene snapshot %s.", path, exc_info=True)
+            return False
+        if snapshot is None:
+            return False
+        scene_cache, self._scene_apply_counts = snapshot
+        self._scene_cache = scene_cache
+        self.logger.info("Loaded %d scene(s) from snapshot %s.", len(scene_cache), path)
+        return True
+
+    async def reconcile_scene_cache(self) -> None:
+        """Replace the snapshot cache with the database state, retrying until the database is reachable."""
+        while True:
+            try:
+                await schema.migrate_schema(self.db_engine, self.logger)
+                await self.reload_scene_cache()
+                return
+            except (OSError, SQLAlchemyError):
+                self.metrics.scene_cache.failed_refresh_count += 1
+                self.logger.error(
+                    "Reconciling the scene snapshot failed; retrying in %s seconds...",
+                    SCENE_RECONCILE_RETRY_INTERVAL,
+                    exc_info=True,
+                )
+                await asyncio.sleep(SCENE_RECONCILE_RETRY_INTERVAL)
+
+    async def save_scene_snapshot(self) -> None:
+        path = self.config_obj.scene_snapshot_path
+        if path is None:
+            return
+        try:
+            await asyncio.to_thread(
+                write_snapshot, path, self._scene_cache, self.scene_devices is None, self._scene_apply_counts.copy()
+            )
+        except OSError:
+            self.logger.warning("Writing scene snapshot %s failed.", path, exc_info=True)
+
+    async def reload_scene_cache(self) -> None:
+        """
+        Replace the cache with all scenes currently stored in the database.
+
+        The new snapshot is built completely before it is swapped in, so readers keep using the
+        old one until then. Scenes and devices are streamed as plain column rows of one joined
+        query instead of being loaded as ORM instances.
+        """
+        self.logger.debug("Loading devices into cache asynchronously.")
+        started_at = time.monotonic()
+        self._scene_ids_patched_during_reload = set()
+        try:
             async with AsyncSession(self.db_engine) as session:
-                result = (await session.exec(select(SceneSkillScenes).options(selectinload("*")))).all()
-                self._scene_cache = {scene.name: list(scene.devices) for scene in result}
+                watermark = await self._fetch_scene_watermark(session)
+                scene_cache = await self._load_scenes(session, with_devices=self.scene_devices is None)
+            self._scene_cache = scene_cache
+            self._scene_watermark = watermark
+            self.metrics.scene_cache.record_swap(started_at, time.monotonic() - started_at)
+        finally:
+            patched_scene_ids, self._scene_ids_patched_during_reload = self._scene_ids_patched_during_reload, None
+        if self.scene_devices is not None:
+            self.scene_devices.clear()
+            await self.prefetch_scene_devices()
+        if patched_scene_ids:
+            await self.refresh_scenes(patched_scene_ids)
+        await self.save_scene_snapshot()
+        await self.subscribe_state_topics()
+
+    @staticmethod
+    async def _load_scenes(
+        session: AsyncSession, with_devices: bool, scene_ids: Iterable[int] | None = None
+    ) -> SceneCache:
+        """Stream the rows of all scenes, or only of the given ids, into a new cache."""
+        query = scene_rows_query(with_devices)
+        if scene_ids is not None:
+            query = query.where(SCENES_TABLE.c.id.in_(scene_ids))
+        loader = SceneCacheLoader(with_devices=with_devices)
+        rows = await session.stream(query.execution_options(yield_per=SCENE_LOAD_BATCH_SIZE))
+        async for partition in rows.partitions():
+            loader.add_rows(partition)
+        return loader.finish()
+
+    async def _fetch_scene_plans(self, names: list[str]) -> dict[str, PublishPlan]:
+        scene_ids = self._scene_cache.scene_ids()
+        ids = [scene_ids[name] for name in names if name in scene_ids]
+        if not ids:
+            return {}
+        async with AsyncSession(self.db_engine) as session:
+            loaded = await self._load_scenes(session, with_devices=True, scene_ids=ids)
+        plans = {name: loaded[name] for name in loaded}
+        if self.state_mirror is not None:
+            await self.state_mirror.subscribe(self.mqtt_client, (device for plan in plans.values() for device in plan))
+        return plans
+
+    async def load_scene_devices(self, names: list[str]) -> list[DeviceRecord]:
+        """Return the merged devices of the scenes, loading scenes missing from the device cache."""
+        if self.scene_devices is None:
+            raise RuntimeError("Scene devices are only loaded on demand with lazy_scene_devices.")
+        self._scene_apply_counts.update(names)
+        plans: dict[str, PublishPlan] = {}
+        for name in names:
+            plan = self.scene_devices.get(name)
+            if plan is not None:
+                plans[name] = plan
+        missing = [name for name in names if name not in plans]
+        if missing:
+            fetched = await self._fetch_scene_plans(missing)
+            for name, plan in fetched.items():
+                self.scene_devices.put(name, plan)
+            plans.update(fetched)
+        return merge_publish_plans(
+            [plans[name] for name in names if name in plans],
+            last_wins=self.config_obj.scene_merge_precedence == "last",
+        )
+
+    async def prefetch_scene_devices(self) -> None:
+        """Load the devices of the most applied scenes into the device cache."""
+        count = self.config_obj.scene_prefetch_count
+        if self.scene_devices is None or count <= 0:
+            return
+        names = [name for name, _ in self._scene_apply_counts.most_common() if name in self._scene_cache][:count]
+        for name, plan in (await self._fetch_scene_plans(names)).items():
+            self.scene_devices.put(name, plan)
+        self.logger.debug("Prefetched the devices of %d scene(s).", len(names))
+
+    async def subscribe_state_topics(self) -> None:
+        """Subscribe to the state topics of cached devices if the state mirror is enabled."""
+        if self.state_mirror is not None:
+            await self.state_mirror.subscribe(self.mqtt_client, self._scene_cache.devices())
+
+    def revalidate_scene_cache(self) -> None:
+        """Start a background reload once the cache is older than the configured TTL."""
+        ttl = self.config_obj.scene_cache_ttl
+        if ttl is None or self.metrics.scene_cache.staleness_seconds < ttl:
+            return
+        if self._scene_reload_task is None or self._scene_reload_task.done():
+            self.logger.debug("Scene cache is older than %s seconds, reloading in background.", ttl)
+            self._scene_reload_task = self.add_task(self._reload_scene_cache_in_background())
+
+    async def _reload_scene_cache_in_background(self) -> None:
+        try:
+            await self.reload_scene_cache()
+        except (OSError, SQLAlchemyError):
+            self.metrics.scene_cache.failed_refresh_count += 1
+            self.logger.error("Background scene cache reload failed, serving the stale cache.", exc_info=True)
+
+    @staticmethod
+    async def _fetch_scene_watermark(session: AsyncSession) -> datetime | None:
+        scenes_version = (await session.exec(select(func.max(SceneSkillScenes.updated_at)))).one()
+        devices_version = (await session.exec(select(func.max(SceneSkillDevices.updated_at)))).one()
+        versions = [version for version in (scenes_version, devices_version) if version is not None]
+        return max(versions, default=None)
+
+    async def refresh_changed_scenes(self) -> None:
+        """
+        Patch the cache with scenes changed since the last seen row version.
+
+        Only rows with a newer updated_at are fetched. Deleted rows leave no version behind, so they
+        are detected by comparing the scene ids and device counts with the cache.
+        """
+        async with AsyncSession(self.db_engine) as session:
+            watermark = await self._fetch_scene_watermark(session)
+            changed: set[int] = set()
+            if self._scene_watermark is not None:
+                since = self._scene_watermark - DELTA_REFRESH_OVERLAP
+                changed.update(
+                    scene_id
+                    for scene_id in (
+                        await session.exec(select(SceneSkillScenes.id).where(col(SceneSkillScenes.updated_at) > since))
+                    ).all()
+                    if scene_id is not None
+                )
+                changed.update(
+                    (
+                        await session.exec(
+                            select(SceneSkillDevices.scene_id)
+                            .where(col(SceneSkillDevices.updated_at) > since)
+                            .distinct()
+                        )
+                    ).all()
+                )
+            device_counts = dict(
+                (
+                    await session.exec(
+                        select(SceneSkillScenes.id, func.count(col(SceneSkillDevices.id)))
+                        .outerjoin(SceneSkillDevices)
+                        .group_by(col(SceneSkillScenes.id))
+                    )
+                ).all()
+            )
+        if self.scene_devices is None:
+            cached_counts = self._scene_cache.device_counts()
+        else:
+            # Only scenes with loaded devices can be out of date, the others just need to exist
+            scene_ids = self._scene_cache.scene_ids()
+            cached_counts = {scene_id: device_counts.get(scene_id, -1) for scene_id in scene_ids.values()}
+            cached_counts.update(self.scene_devices.device_counts(scene_ids))
+        changed.update(scene_id for scene_id, count in cached_counts.items() if device_counts.get(scene_id) != count)
+        changed.update(scene_id for scene_id in device_counts if scene_id is not None and scene_id not in cached_counts)
+        if changed:
+            await self.refresh_scenes(changed)
+        self._scene_watermark = watermark
+
+    async def run_periodic_scene_refresh(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_changed_scenes()
+            except (OSError, SQLAlchemyError):
+                self.logger.error("Periodic scene refresh failed, keeping the current cache.", exc_info=True)
+
+    async def refresh_scenes(self, scene_ids: set[int]) -> None:
+        """Reload only the given scenes and patch their cache entries."""
+        async with AsyncSession(self.db_engine) as session:
+            loaded = await self._load_scenes(session, with_devices=self.scene_devices is None, scene_ids=scene_ids)
+        affected = self._scene_cache.update_scenes(scene_ids, loaded)
+        if self.scene_devices is not None:
+            self.scene_devices.discard(affected)
+        if self._scene_ids_patched_during_reload is not None:
+            self._scene_ids_patched_during_reload.update(scene_ids)
+        self.logger.info("Refreshed %d changed scene(s) in cache.", len(scene_ids))
+        await self.subscribe_state_topics()
+
+    async def listen_to_messages(self, client: aiomqtt.Client) -> None:
+        """Handle intent results like the base skill and feed device state messages to the state mirror."""
+        async for message in client.messages:
+            self.logger.debug("Received message on topic %s", message.topic)
+
+            if self.state_mirror is not None and self.state_mirror.is_state_topic(message.topic.value):
+                if isinstance(message.payload, bytes | bytearray):
+                    self.state_mirror.update(message.topic.value, bytes(message.payload))
+                elif isinstance(message.payload, str):
+                    self.state_mirror.update(message.topic.value, message.payload.encode("utf-8"))
+            elif message.topic.matches(self.config_obj.intent_analysis_result_topic):
+                payload_str = self.decode_message_payload(message.payload)
+                if payload_str is not None:
+                    await self.handle_client_request_message(payload_str)
 
     async def skill_preparations(self) -> None:
         self._load_templates()
+        if self.publish_pool is not None:
+            self.add_task(self.publish_pool.run())
+        if self.brokers is not None:
+            self.add_task(self.brokers.run())
         await self.load_scene_cache()
+        if self.config_obj.live_scene_updates_enabled and self.db_engine.dialect.name == "postgresql":
+            listener = SceneChangeListener(
+                self.db_engine,
+                on_change=self.refresh_scenes,
+                on_resync=self.reload_scene_cache,
+                logger=self.logger,
+            )
+            self.add_task(listener.run())
+        elif self.config_obj.scene_refresh_interval is not None:
+            self.add_task(self.run_periodic_scene_refresh(self.config_obj.scene_refresh_interval))
+        if self.config_obj.metrics_interval is not None:
+            self.add_task(self.publish_metrics(self.config_obj.metrics_interval))
+
+    async def publish_metrics(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.mqtt_client.publish(self.config_obj.metrics_topic, self.metrics.model_dump_json(), qos=0)
 
     async def calculate_certainty(self, intent_analysis_result: commons.IntentAnalysisResult) -> float:
-        keywords = ["scenery", "scene", "scenario"]
-        if any(noun in keywords for noun in intent_analysis_result.nouns):
-            self.logger.info("Keywords %s in nouns detected, certainty set to 1.0.", keywords)
+        if any(noun in SCENE_KEYWORDS for noun in intent_analysis_result.nouns):
+            self.logger.info("Keywords %s in nouns detected, certainty set to 1.0.", SCENE_KEYWORDS)
             return 1.0
         self.logger.debug("No keyword in nouns detected, certainty set to 0.")
         return 0
 
-    def find_parameter_scenes(self, nouns: list[str]) -> tuple[list[str], list[SceneSkillDevices]]:
-        names = []
-        devices: list[SceneSkillDevices] = []
-        nouns_lower = [n.lower() for n in nouns]
-        for scene_name, scene_devices in self._scene_cache.items():
-            if scene_name in nouns_lower:
-                names.append(scene_name)
-                devices += scene_devices
+    def find_parameter_scenes(self, nouns: list[str], text: str = "") -> tuple[list[str], list[DeviceRecord]]:
+        names = self._scene_cache.match(nouns, text)
+        if not names and self.config_obj.fuzzy_match_enabled:
+            names = self._scene_cache.fuzzy_match(
+                [noun for noun in nouns if noun not in SCENE_KEYWORDS],
+                text,
+                max_distance=self.config_obj.fuzzy_match_max_distance,
+                time_budget_ms=self.config_obj.fuzzy_match_time_budget_ms,
+            )
+            self.logger.debug("No exact scene match, fuzzy matching found %s.", names)
+        devices = merge_publish_plans(
+            [self._scene_cache[scene_name] for scene_name in names],
+            last_wins=self.config_obj.scene_merge_precedence == "last",
+        )
         return names, devices
 
     def find_parameters(self, action: Action, intent_analysis_result: commons.IntentAnalysisResult) -> Parameters:
+        self.revalidate_scene_cache()
         parameters = Parameters()
         if action == Action.LIST:
             parameters.scene_names = list(self._scene_cache)
         elif action == Action.APPLY:
-            parameters.scene_names, parameters.devices = self.find_parameter_scenes(intent_analysis_result.nouns)
+            parameters.scene_names, parameters.devices = self.find_parameter_scenes(
+                intent_analysis_result.nouns, intent_analysis_result.client_request.text
+            )
         self.logger.debug("Parameters found for action %s: %s.", action, parameters)
         return parameters
 
-    def get_answer(self, action: Action, parameters: Parameters) -> str:
+    def get_answer(self, action: Action, parameters: Parameters, result: PublishResult | None = None) -> str:
         template = self.action_to_template.get(action)
         if template:
             answer = template.render(
                 action=action,
                 parameters=parameters,
+                result=result,
             )
             self.logger.debug("Generated answer using template for action %s.", action)
             return answer
         self.logger.error("No template found for action %s.", action)
         return "Sorry, couldn't process your request."
 
-    async def send_mqtt_command(self, parameters: Parameters) -> None:
+    async def send_mqtt_command(self, parameters: Parameters, result: PublishResult | None = None) -> PublishResult:
         """Send the MQTT command asynchronously."""
-        for device in parameters.devices:
-            self.logger.info(
-                "Sending payload %s to topic %s via MQTT.",
-                device.topic,
-                device.scene_payload,
-            )
-            await self.mqtt_client.publish(device.topic, device.scene_payload, qos=1)
+        devices = parameters.devices
+        if result is None:
+            result = PublishResult(len(devices))
+        if self.state_mirror is not None:
+            devices = self.state_mirror.changed_devices(devices)
+            saved = len(parameters.devices) - len(devices)
+            self.metrics.publish.saved_publishes += saved
+            # Devices already reporting the scene state count as confirmed
+            result.acknowledged += saved
+            self.logger.info("Skipping %d device(s) already in the scene state.", saved)
+        return await self.publisher.publish(devices, result)
+
+    async def apply_and_respond(
+        self, action: Action, parameters: Parameters, client_request: commons.ClientRequest
+    ) -> None:
+        """
+        Publish the scene devices and answer once all publishes completed or the confirmation timeout passed.
+
+        Publishes still running at the deadline continue in the background and are reported as timed out.
+        """
+        result = PublishResult(len(parameters.devices))
+        publish_task = self.add_task(self.send_mqtt_command(parameters, result))
+        await asyncio.wait({publish_task}, timeout=self.config_obj.apply_confirmation_timeout)
+        answer = self.get_answer(action, parameters, result)
+        await self.send_response(answer, client_request=client_request)
+
+    def claim_publish_wave(self, scene_names: list[str]) -> bool:
+        """
+        Return whether the scenes need to be published.
+
+        Applies of the same scene set within the coalescing window, typically one utterance heard
+        by several satellites, share the publish wave of the first request.
+        """
+        window = self.config_obj.apply_coalesce_window
+        if window <= 0:
+            return True
+        now = time.monotonic()
+        self._recent_publish_waves = {
+            scenes: started_at for scenes, started_at in self._recent_publish_waves.items() if now - started_at < window
+        }
+        key = frozenset(scene_names)
+        if key in self._recent_publish_waves:
+            self.metrics.publish.coalesced_apply_count += 1
+            self.logger.info("Scenes %s were just applied, sharing the running publish wave.", scene_names)
+            return False
+        self._recent_publish_waves[key] = now
+        return True
 
     async def process_request(self, intent_analysis_result: commons.IntentAnalysisResult) -> None:
         action = Action.find_matching_action(intent_analysis_result.verbs)
@@ -124,10 +515,35 @@ class SceneSkill(commons.BaseSkill):
             return
 
         parameters = self.find_parameters(action, intent_analysis_result=intent_analysis_result)
-        if parameters.scene_names:
-            answer = self.get_answer(action, parameters)
-            self.add_task(self.send_response(answer, client_request=intent_analysis_result.client_request))
-            if action not in [Action.HELP, Action.LIST]:
-                self.add_task(self.send_mqtt_command(parameters))
-        else:
+        if not parameters.scene_names:
             self.logger.error("No targets found for action %s.", action)
+        elif action == Action.APPLY and self.scene_devices is not None:
+            # Loading devices may query the database, so keep the message loop free meanwhile
+            self.add_task(self.apply_lazy_scenes(action, parameters, intent_analysis_result.client_request))
+        else:
+            self.respond(action, parameters, intent_analysis_result.client_request)
+
+    async def apply_lazy_scenes(
+        self, action: Action, parameters: Parameters, client_request: commons.ClientRequest
+    ) -> None:
+        try:
+            parameters.devices = await self.load_scene_devices(parameters.scene_names)
+        except (OSError, SQLAlchemyError):
+            self.logger.error("Loading the devices of scenes %s failed.", parameters.scene_names, exc_info=True)
+            scene_names = ", ".join(parameters.scene_names)
+            await self.send_response(
+                f"Sorry, the scene {scene_names} could not be applied right now.", client_request=client_request
+            )
+            return
+        self.respond(action, parameters, client_request)
+
+    def respond(self, action: Action, parameters: Parameters, client_request: commons.ClientRequest) -> None:
+        """Schedule the answer and, for applies, the device publishes."""
+        publish = action not in [Action.HELP, Action.LIST] and self.claim_publish_wave(parameters.scene_names)
+        if publish and self.config_obj.apply_confirmation_timeout is not None:
+            self.add_task(self.apply_and_respond(action, parameters, client_request))
+            return
+        answer = self.get_answer(action, parameters)
+        self.add_task(self.send_response(answer, client_request=client_request))
+        if publish:
+            self.add_task(self.send_mqtt_command(parameters))
@@ -0,0 +1,99 @@
+import collections
+import json
+import pathlib
+import zlib
+from collections.abc import Mapping
+from typing import NamedTuple
+
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.scene_cache import SceneCache
+
+# Bumped whenever the layout of a snapshot changes, snapshots of other versions are ignored
+SNAPSHOT_FORMAT = 2
+
+
+class SceneSnapshot(NamedTuple):
+    scene_cache: SceneCache
+    # How often each scene was applied, ranking the scenes prefetched with lazy scene devices
+    apply_counts: collections.Counter[str]
+
+
+def _encode_device(device: DeviceRecord) -> list:
+    return [
+        device.topic,
+        device.payload.decode("utf-8"),
+        device.qos,
+        device.retain,
+        device.stage,
+        device.stage_delay,
+        device.state_topic,
+        device.broker,
+    ]
+
+
+def _decode_device(fields: list) -> DeviceRecord:
+    topic, payload, qos, retain, stage, stage_delay, state_topic, broker = fields
+    return DeviceRecord(
+        topic=topic,
+        payload=payload.encode("utf-8"),
+        qos=qos,
+        retain=retain,
+        stage=stage,
+        stage_delay=stage_delay,
+        state_topic=state_topic,
+        broker=broker,
+    )
+
+
+def write_snapshot(
+    path: pathlib.Path,
+    scene_cache: SceneCache,
+    with_devices: bool = True,
+    apply_counts: Mapping[str, int] | None = None,
+) -> None:
+    """
+    Write the scene cache and the apply counts of its scenes to a compressed JSON snapshot.
+
+    Devices are stored as positional lists to keep the file small. Without with_devices the cache
+    holds only scene names, as with devices loaded on demand, and the snapshot records that. The
+    file is replaced atomically, so a crash while writing leaves the previous snapshot intact.
+    """
+    scene_ids = scene_cache.scene_ids()
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "with_devices": with_devices,
+        "scenes": [
+            [name, scene_ids.get(name), [_encode_device(device) for device in scene_cache[name]]]
+            for name in scene_cache
+        ],
+        "apply_counts": {name: count for name, count in (apply_counts or {}).items() if name in scene_cache},
+    }
+    data = zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    temporary_path.write_bytes(data)
+    temporary_path.replace(path)
+
+
+def read_snapshot(path: pathlib.Path, with_devices: bool = True) -> SceneSnapshot | None:
+    """
+    Return the scene cache and apply counts stored in a snapshot.
+
+    Returns None if there is no snapshot of the current format, or if it was written with devices
+    while with_devices is off or the other way round.
+
+    Raises ValueError if the snapshot is corrupt.
+    """
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    try:
+        snapshot = json.loads(zlib.decompress(data))
+    except zlib.error as e:
+        raise ValueError(f"Corrupt scene snapshot {path}.") from e
+    if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("with_devices") != with_devices:
+        return None
+    scene_cache = SceneCache()
+    for name, scene_id, devices in snapshot["scenes"]:
+        scene_cache.set_scene(name, [_decode_device(device) for device in devices], scene_id=scene_id)
+    return SceneSnapshot(scene_cache, collections.Counter(snapshot.get("apply_counts", {})))
@@ -0,0 +1,92 @@
+import re
+
+TOKEN_REGEX = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens, the unit scene names are matched on."""
+    return TOKEN_REGEX.findall(text.lower())
+
+
+class _TrieNode:
+    __slots__ = ("children", "scene_name")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.scene_name: str | None = None
+
+
+class SceneTrie:
+    """
+    Token trie over scene names for matching multi-word scenes in utterances.
+
+    Every scene name is stored as its token sequence, e.g. "movie night" as ("movie", "night").
+    Matching walks the token stream once from left to right. At each position the longest
+    scene starting there wins and the scan continues after it, so "movie night" is preferred
+    over a scene called "movie". The work per token is bounded by the longest scene name, not
+    by the number of scenes.
+    """
+
+    def __init__(self) -> None:
+        self._root = _TrieNode()
+        self._max_depth = 0
+
+    @property
+    def max_depth(self) -> int:
+        """Number of tokens of the longest scene name added so far."""
+        return self._max_depth
+
+    def add(self, scene_name: str) -> None:
+        tokens = tokenize(scene_name)
+        if not tokens:
+            return
+        node = self._root
+        for token in tokens:
+            node = node.children.setdefault(token, _TrieNode())
+        node.scene_name = scene_name
+        self._max_depth = max(self._max_depth, len(tokens))
+
+    def remove(self, scene_name: str) -> None:
+        tokens = tokenize(scene_name)
+        path = [self._root]
+        for token in tokens:
+            child = path[-1].children.get(token)
+            if child is None:
+                return
+            path.append(child)
+        if path[-1].scene_name != scene_name:
+            return
+        path[-1].scene_name = None
+        # Prune branches that no longer lead to any scene
+        for depth in range(len(tokens), 0, -1):
+            node = path[depth]
+            if node.children or node.scene_name is not None:
+                break
+            del path[depth - 1].children[tokens[depth - 1]]
+
+    def find(self, tokens: list[str]) -> list[tuple[int, int, str]]:
+        """
+        Return the start, end and name of every scene named in tokens, in order of appearance.
+
+        At each position the longest scene starting there wins and the scan continues after it.
+        """
+        matches = []
+        position = 0
+        while position < len(tokens):
+            node = self._root
+            match_name = None
+            match_end = position
+            for offset in range(position, min(len(tokens), position + self._max_depth)):
+                child = node.children.get(tokens[offset])
+                if child is None:
+                    break
+                node = child
+                if node.scene_name is not None:
+                    match_name = node.scene_name
+                    match_end = offset + 1
+            if match_name is None:
+                position += 1
+                continue
+            matches.append((position, match_end, match_name))
+            position = match_end
+        return matches
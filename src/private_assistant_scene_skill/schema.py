@@ -0,0 +1,170 @@
+import logging
+from collections.abc import Callable
+
+from sqlalchemy import Connection, delete, insert, inspect, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn, CreateTable
+from sqlmodel import SQLModel
+
+from private_assistant_scene_skill import scene_listener
+from private_assistant_scene_skill.models import SceneSkillSchemaVersion
+
+SCHEMA_VERSION_TABLE = SQLModel.metadata.tables[str(SceneSkillSchemaVersion.__tablename__)]
+MODEL_TABLES = [table for table in SQLModel.metadata.sorted_tables if table is not SCHEMA_VERSION_TABLE]
+
+
+def _rebuild_sqlite_tables(conn: Connection) -> None:
+    """Recreate the tables from the models, keeping the rows of the columns both versions have."""
+    inspector = inspect(conn)
+    old_columns = {
+        table.name: {column["name"] for column in inspector.get_columns(table.name)} for table in MODEL_TABLES
+    }
+    # Index names are global in SQLite, so the indexes of the old tables have to go before creating the new ones
+    for table in reversed(MODEL_TABLES):
+        for index in inspector.get_indexes(table.name):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{table.name}_old"'))
+    for table in MODEL_TABLES:
+        table.create(conn)
+        columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in old_columns[table.name])
+        conn.execute(text(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{table.name}_old"'))
+    for table in reversed(MODEL_TABLES):
+        conn.execute(text(f'DROP TABLE "{table.name}_old"'))
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """
+    Add the columns and indexes of the models the database lacks, with the server defaults of the models.
+
+    SQLite cannot add columns defaulting to CURRENT_TIMESTAMP or change defaults, so its tables are rebuilt.
+    """
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_tables(conn)
+        return
+    inspector = inspect(conn)
+    for table in MODEL_TABLES:
+        ddl_compiler = conn.dialect.ddl_compiler(conn.dialect, CreateTable(table))
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(conn)}"))
+            elif column.server_default is not None:
+                default = ddl_compiler.get_column_default_string(column)
+                conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET DEFAULT {default}"))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+POSTGRES_UPDATED_AT_STATEMENTS = [
+    """
+    CREATE OR REPLACE FUNCTION sceneskill_set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := timezone('utc', clock_timestamp());
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        statement
+        for table in MODEL_TABLES
+        for statement in (
+            f"DROP TRIGGER IF EXISTS {table.name}_updated_at ON {table.name}",
+            f"""
+            CREATE TRIGGER {table.name}_updated_at BEFORE UPDATE ON {table.name}
+            FOR EACH ROW EXECUTE FUNCTION sceneskill_set_updated_at()
+            """,
+        )
+    ),
+]
+SQLITE_UPDATED_AT_STATEMENTS = [
+    statement
+    for table in MODEL_TABLES
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {table.name}_updated_at",
+        # Updates that set updated_at themselves, like those of the ORM, keep their value
+        f"""
+        CREATE TRIGGER {table.name}_updated_at AFTER UPDATE ON {table.name}
+        FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at BEGIN
+            UPDATE {table.name} SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+        END
+        """,
+    )
+]
+
+
+def _install_updated_at_triggers(conn: Connection) -> None:
+    """Create or replace the triggers bumping updated_at on updates made with plain SQL as well."""
+    statements = POSTGRES_UPDATED_AT_STATEMENTS if conn.dialect.name == "postgresql" else SQLITE_UPDATED_AT_STATEMENTS
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+# Version 1 is the schema from before versioning, with scenes and devices only. Migration 2 adds
+# whatever model columns are missing, so it also upgrades databases of any unversioned release.
+SCHEMA_MIGRATIONS: dict[int, Callable[[Connection], None]] = {
+    2: _add_missing_columns,
+    3: _install_updated_at_triggers,
+}
+SCHEMA_VERSION = max(SCHEMA_MIGRATIONS)
+# Key of the Postgres advisory lock serializing migrations of replicas starting at the same time
+SCHEMA_LOCK_KEY = 0x5CE4E5
+
+
+def read_schema_version(conn: Connection) -> int | None:
+    """Return the stored schema version, or None if the database is not versioned yet."""
+    try:
+        return conn.execute(select(SCHEMA_VERSION_TABLE.c.version)).scalar_one_or_none()
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def _detect_schema_version(conn: Connection) -> int:
+    """Return the version of an unversioned database, 0 for an empty one."""
+    inspector = inspect(conn)
+    if inspector.has_table(SCHEMA_VERSION_TABLE.name):
+        return conn.execute(select(SCHEMA_VERSION_TABLE.c.version)).scalar_one_or_none() or 0
+    return 1 if inspector.has_table("sceneskillscenes") else 0
+
+
+def _apply_migrations(conn: Connection, version: int) -> None:
+    if version == 0:
+        SQLModel.metadata.create_all(conn)
+        _install_updated_at_triggers(conn)
+    else:
+        for migration in range(version + 1, SCHEMA_VERSION + 1):
+            SCHEMA_MIGRATIONS[migration](conn)
+        SCHEMA_VERSION_TABLE.create(conn, checkfirst=True)
+    conn.execute(delete(SCHEMA_VERSION_TABLE))
+    conn.execute(insert(SCHEMA_VERSION_TABLE).values(version=SCHEMA_VERSION))
+
+
+async def migrate_schema(db_engine: AsyncEngine, logger: logging.Logger) -> None:
+    """
+    Bring the database schema to SCHEMA_VERSION.
+
+    A current schema costs a single query. Otherwise the missing migrations run in one transaction,
+    on Postgres under an advisory lock so that only one of several starting replicas migrates.
+    """
+    async with db_engine.connect() as conn:
+        version = await conn.run_sync(read_schema_version)
+    if version == SCHEMA_VERSION:
+        logger.debug("Database schema is at version %d.", version)
+        return
+    postgres = db_engine.dialect.name == "postgresql"
+    async with db_engine.begin() as conn:
+        if postgres:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        current = await conn.run_sync(_detect_schema_version)
+        if current == SCHEMA_VERSION:
+            return
+        if current > SCHEMA_VERSION:
+            # A newer replica migrated already during a rolling update
+            logger.warning(
+                "Database schema version %d is newer than version %d of this skill.", current, SCHEMA_VERSION
+            )
+            return
+        await conn.run_sync(_apply_migrations, current)
+        if postgres:
+            await scene_listener.install_scene_triggers(conn)
+    logger.info("Migrated database schema from version %d to %d.", current, SCHEMA_VERSION)
@@ -0,0 +1,78 @@
+import json
+import logging
+from collections.abc import Iterable, Sequence
+
+import aiomqtt
+
+from private_assistant_scene_skill.models import DeviceRecord
+
+# Topics per SUBSCRIBE packet, brokers limit the size of a single subscription request
+SUBSCRIBE_BATCH_SIZE = 100
+
+
+def payload_matches_state(payload: bytes, state: bytes) -> bool:
+    """
+    Return whether publishing payload would leave a device in the given state unchanged.
+
+    JSON objects match when every key of the payload has the same value in the state, so
+    {"state": "ON"} matches a reported {"state": "ON", "brightness": 200}. Other payloads
+    must be equal.
+    """
+    if payload == state:
+        return True
+    if not payload.startswith(b"{"):
+        return False
+    try:
+        command = json.loads(payload)
+        current = json.loads(state)
+    except ValueError:
+        return False
+    if not isinstance(command, dict) or not isinstance(current, dict):
+        return False
+    return all(key in current and current[key] == value for key, value in command.items())
+
+
+class StateMirror:
+    """
+    Last reported state of every scene device, fed by the devices' state topics.
+
+    A device without an explicit state topic reports on its command topic plus state_topic_suffix.
+    Only devices on the skill's own broker are mirrored, devices on other brokers are always published.
+    """
+
+    def __init__(self, state_topic_suffix: str, logger: logging.Logger) -> None:
+        self.state_topic_suffix = state_topic_suffix
+        self.logger = logger
+        self._states: dict[str, bytes] = {}
+        self._subscribed: set[str] = set()
+
+    def state_topic(self, device: DeviceRecord) -> str:
+        return device.state_topic or f"{device.topic}{self.state_topic_suffix}"
+
+    def is_state_topic(self, topic: str) -> bool:
+        return topic in self._subscribed
+
+    def update(self, topic: str, payload: bytes) -> None:
+        self._states[topic] = payload
+
+    async def subscribe(self, mqtt_client: aiomqtt.Client, devices: Iterable[DeviceRecord]) -> None:
+        """Subscribe to the state topics of all given devices not subscribed yet."""
+        new_topics = sorted(
+            {self.state_topic(device) for device in devices if device.broker is None} - self._subscribed
+        )
+        if not new_topics:
+            return
+        for start in range(0, len(new_topics), SUBSCRIBE_BATCH_SIZE):
+            batch = new_topics[start : start + SUBSCRIBE_BATCH_SIZE]
+            await mqtt_client.subscribe([(topic, 0) for topic in batch])
+            self._subscribed.update(batch)
+        self.logger.info("Subscribed to %d device state topic(s).", len(new_topics))
+
+    def changed_devices(self, devices: Sequence[DeviceRecord]) -> list[DeviceRecord]:
+        """Return the devices whose last known state differs from their scene payload."""
+        changed = []
+        for device in devices:
+            state = self._states.get(self.state_topic(device)) if device.broker is None else None
+            if state is None or not payload_matches_state(device.payload, state):
+                changed.append(device)
+        return changed
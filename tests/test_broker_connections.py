@@ -0,0 +1,140 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import aiomqtt
+import pytest
+
+from private_assistant_scene_skill.broker_connections import BrokerConnections
+from private_assistant_scene_skill.config import BrokerConfig
+from private_assistant_scene_skill.metrics import PublishMetrics
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.publisher import ScenePublisher
+
+
+class FakeClient:
+    """aiomqtt.Client stand-in recording connections and publishes."""
+
+    instances: list["FakeClient"] = []
+    unreachable: set[str] = set()
+
+    def __init__(self, hostname, **kwargs):
+        self.hostname = hostname
+        self.identifier = kwargs.get("identifier")
+        self.closed = False
+        self.publish = AsyncMock()
+        FakeClient.instances.append(self)
+
+    async def __aenter__(self):
+        await asyncio.sleep(0)
+        if self.hostname in FakeClient.unreachable:
+            raise aiomqtt.MqttError("connection refused")
+        return self
+
+    async def __aexit__(self, *_exc_info):
+        self.closed = True
+
+
+@pytest.fixture
+def brokers(monkeypatch):
+    FakeClient.instances = []
+    FakeClient.unreachable = set()
+    monkeypatch.setattr("private_assistant_scene_skill.broker_connections.aiomqtt.Client", FakeClient)
+    return BrokerConnections(
+        {"garden": BrokerConfig(host="garden.local"), "garage": BrokerConfig(host="garage.local")},
+        client_id="scene_skill",
+        logger=Mock(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_brokers_connect_lazily_and_reuse_connections(brokers):
+    assert FakeClient.instances == []
+
+    client = await brokers.client_for("garden")
+    assert await brokers.client_for("garden") is client
+    assert [instance.hostname for instance in FakeClient.instances] == ["garden.local"]
+
+    await brokers.discard("garden")
+    assert client.closed
+    assert await brokers.client_for("garden") is not client
+
+
+@pytest.mark.asyncio
+async def test_publisher_routes_devices_to_their_broker(brokers):
+    control_client = AsyncMock()
+    publisher = ScenePublisher(control_client, concurrency=1, metrics=PublishMetrics(), logger=Mock(), brokers=brokers)
+    devices = [
+        DeviceRecord(topic="light/1", payload=b"ON"),
+        DeviceRecord(topic="light/1", payload=b"ON", broker="garden"),
+        DeviceRecord(topic="door/1", payload=b"OPEN", broker="garage"),
+        DeviceRecord(topic="light/2", payload=b"ON", broker="attic"),
+    ]
+
+    result = await publisher.publish(devices)
+
+    control_client.publish.assert_awaited_once_with("light/1", b"ON", qos=1, retain=False)
+    garden, garage = FakeClient.instances
+    garden.publish.assert_awaited_once_with("light/1", b"ON", qos=1, retain=False)
+    garage.publish.assert_awaited_once_with("door/1", b"OPEN", qos=1, retain=False)
+    assert (result.acknowledged, result.failed) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_publisher_publishes_brokers_in_parallel(brokers):
+    release = asyncio.Event()
+
+    async def slow_publish(*_args, **_kwargs):
+        await release.wait()
+
+    control_client = AsyncMock()
+    control_client.publish.side_effect = slow_publish
+    publisher = ScenePublisher(control_client, concurrency=1, metrics=PublishMetrics(), logger=Mock(), brokers=brokers)
+    devices = [
+        DeviceRecord(topic="light/1", payload=b"ON"),
+        DeviceRecord(topic="light/1", payload=b"ON", broker="garden"),
+    ]
+
+    publish = asyncio.create_task(publisher.publish(devices))
+    await asyncio.sleep(0.01)
+    FakeClient.instances[0].publish.assert_awaited_once()
+    release.set()
+    await publish
+
+
+@pytest.mark.asyncio
+async def test_publisher_discards_failed_broker_connection(brokers):
+    client = await brokers.client_for("garden")
+    client.publish.side_effect = aiomqtt.MqttError("disconnected")
+    publisher = ScenePublisher(AsyncMock(), concurrency=1, metrics=PublishMetrics(), logger=Mock(), brokers=brokers)
+
+    result = await publisher.publish([DeviceRecord(topic="light/1", payload=b"ON", broker="garden")])
+
+    assert result.failed == 1
+    assert client.closed
+
+
+@pytest.mark.asyncio
+async def test_broker_client_ids_differ_between_processes(brokers):
+    other = BrokerConnections({"garden": BrokerConfig(host="garden.local")}, client_id="scene_skill", logger=Mock())
+    await brokers.client_for("garden")
+    await other.client_for("garden")
+
+    first, second = FakeClient.instances
+    assert first.identifier != second.identifier
+    assert first.identifier.startswith("scene_skill-")
+
+
+@pytest.mark.asyncio
+async def test_unreachable_broker_is_not_retried_per_device(brokers):
+    FakeClient.unreachable = {"garden.local"}
+    publisher = ScenePublisher(AsyncMock(), concurrency=8, metrics=PublishMetrics(), logger=Mock(), brokers=brokers)
+    devices = [DeviceRecord(topic=f"light/{i}", payload=b"ON", broker="garden") for i in range(20)]
+
+    result = await publisher.publish(devices)
+
+    assert result.failed == 20
+    assert len(FakeClient.instances) == 1
+
+    brokers._unavailable_until["garden"] = 0
+    FakeClient.unreachable = set()
+    assert await brokers.client_for("garden") is FakeClient.instances[1]
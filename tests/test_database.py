@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import exc, text
+
+from private_assistant_scene_skill.config import SkillConfig
+from private_assistant_scene_skill.database import create_db_engine, pool_metrics
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics_track_checkouts_and_churn(tmp_path):
+    db_engine = create_db_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'skill.db'}",
+        SkillConfig(db_pool_size=1, db_max_overflow=0, db_pool_timeout=0.05),
+    )
+    metrics = pool_metrics(db_engine)
+    assert metrics is not None
+
+    async with db_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        assert metrics.saturation == 1.0
+        with pytest.raises(exc.TimeoutError):
+            async with db_engine.connect() as blocked_conn:
+                await blocked_conn.execute(text("SELECT 1"))
+    await db_engine.dispose()
+
+    assert metrics.checkout_count == 1
+    assert metrics.checked_out == 0
+    assert metrics.checkout_timeout_count == 1
+    assert metrics.max_checkout_wait_ms >= 50
+    assert (metrics.opened_connections, metrics.closed_connections) == (1, 1)
+    assert pool_metrics(db_engine) is metrics
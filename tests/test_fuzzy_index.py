@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from private_assistant_scene_skill import fuzzy_index
+from private_assistant_scene_skill.fuzzy_index import TrigramIndex, bounded_levenshtein
+
+
+@pytest.mark.parametrize(
+    "a,b,max_distance,expected",
+    [
+        ("romantic", "romantic", 2, 0),
+        ("romantik", "romantic", 2, 1),
+        ("mornin", "morning", 2, 1),
+        ("evening", "morning", 2, None),
+        ("tv", "television", 3, None),
+    ],
+)
+def test_bounded_levenshtein(a, b, max_distance, expected):
+    assert bounded_levenshtein(a, b, max_distance) == expected
+
+
+def test_trigram_index_search():
+    index = TrigramIndex()
+    for name in ["romantic", "morning", "movie night"]:
+        index.add(name)
+    deadline = time.perf_counter() + 1
+    assert index.search("romantik", 2, deadline) == ("romantic", 1)
+    assert index.search("movie nigt", 2, deadline) == ("movie night", 1)
+    assert index.search("evening", 1, deadline) is None
+
+    index.remove("romantic")
+    assert index.search("romantik", 2, deadline) is None
+
+
+def test_trigram_index_respects_deadline():
+    index = TrigramIndex()
+    index.add("romantic")
+    assert index.search("romantik", 2, time.perf_counter() - 1) is None
+
+
+def test_trigram_index_checks_deadline_within_large_postings(monkeypatch):
+    monkeypatch.setattr(fuzzy_index, "DEADLINE_CHECK_INTERVAL", 10)
+    index = TrigramIndex()
+    for i in range(1000):
+        index.add(f"scene{i:03d}")
+    checks = []
+    monkeypatch.setattr(time, "perf_counter", lambda: checks.append(0.0) or 0.0)
+
+    assert index.search("scene00x", 2, deadline=1.0)[1] == 1
+    # The "  s" posting holding all 1000 names is counted with a check every 10 names
+    assert len(checks) >= 1000 // 10
@@ -0,0 +1,22 @@
+from unittest.mock import AsyncMock
+
+from typer.testing import CliRunner
+
+from private_assistant_scene_skill import main
+
+runner = CliRunner()
+
+
+def test_skill_runs_without_a_command(monkeypatch):
+    start_skill = AsyncMock()
+    monkeypatch.setattr(main, "start_skill", start_skill)
+
+    assert runner.invoke(main.app, ["tests/data/config.yaml"]).exit_code == 0
+    assert runner.invoke(main.app, [], env={"PRIVATE_ASSISTANT_CONFIG_PATH": "tests/data/config.yaml"}).exit_code == 0
+    assert [str(call.args[0]) for call in start_skill.await_args_list] == ["tests/data/config.yaml"] * 2
+
+
+def test_scene_tools_reject_unknown_formats():
+    result = runner.invoke(main.scenes_app, ["import", "scenes.txt"])
+    assert result.exit_code == 1
+    assert "Cannot tell the format" in result.output
@@ -0,0 +1,58 @@
+from unittest.mock import AsyncMock, Mock
+
+import aiomqtt
+import pytest
+
+from private_assistant_scene_skill.metrics import PublishMetrics
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.publish_pool import PublishConnectionPool
+from private_assistant_scene_skill.publisher import ScenePublisher
+
+
+@pytest.fixture
+def pool():
+    pool = PublishConnectionPool("localhost", 1883, size=4, client_id="scene_skill", logger=Mock())
+    pool._clients = [AsyncMock() for _ in range(4)]
+    return pool
+
+
+def test_client_for_is_stable_per_topic(pool):
+    topics = [f"light/{i}" for i in range(100)]
+    assert [pool.client_for(topic) for topic in topics] == [pool.client_for(topic) for topic in topics]
+    assert {id(pool.client_for(topic)) for topic in topics} == {id(client) for client in pool._clients}
+
+
+def test_client_for_without_connections():
+    pool = PublishConnectionPool("localhost", 1883, size=2, client_id="scene_skill", logger=Mock())
+    assert pool.client_for("light/1") is None
+
+
+@pytest.mark.asyncio
+async def test_publisher_uses_pool_connections(pool):
+    control_client = AsyncMock()
+    publisher = ScenePublisher(control_client, concurrency=4, metrics=PublishMetrics(), logger=Mock(), pool=pool)
+    devices = [DeviceRecord(topic=f"light/{i}", payload=b"ON") for i in range(20)]
+
+    await publisher.publish(devices)
+
+    control_client.publish.assert_not_awaited()
+    assert sum(client.publish.await_count for client in pool._clients) == 20
+
+
+@pytest.mark.asyncio
+async def test_publisher_marks_pool_connection_lost(pool):
+    for client in pool._clients:
+        client.publish.side_effect = aiomqtt.MqttError("disconnected")
+    publisher = ScenePublisher(AsyncMock(), concurrency=1, metrics=PublishMetrics(), logger=Mock(), pool=pool)
+
+    result = await publisher.publish([DeviceRecord(topic="light/1", payload=b"ON")])
+
+    assert result.failed == 1
+    failed_index = pool._clients.index(pool.client_for("light/1"))
+    assert [event.is_set() for event in pool._connection_lost] == [index == failed_index for index in range(4)]
+
+
+def test_pool_client_ids_differ_between_processes():
+    pools = [PublishConnectionPool("localhost", 1883, size=1, client_id="scene_skill", logger=Mock()) for _ in range(2)]
+    assert pools[0].client_id != pools[1].client_id
+    assert pools[0].client_id.startswith("scene_skill-")
@@ -0,0 +1,114 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import aiomqtt
+import pytest
+
+from private_assistant_scene_skill.metrics import PublishMetrics
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.publisher import ScenePublisher
+
+
+class RecordingClient:
+    """MQTT client stand-in that records publish order and the maximum number of publishes in flight."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started: list[str] = []
+
+    async def publish(self, topic, *_args, **_kwargs):
+        self.started.append(topic)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+
+
+def make_publisher(client, concurrency):
+    return ScenePublisher(client, concurrency=concurrency, metrics=PublishMetrics(), logger=Mock())
+
+
+@pytest.mark.asyncio
+async def test_publish_sequential_keeps_order():
+    client = RecordingClient()
+    devices = [DeviceRecord(topic=f"light/{i}", payload=b"ON") for i in range(5)]
+
+    await make_publisher(client, concurrency=1).publish(devices)
+
+    assert client.started == [f"light/{i}" for i in range(5)]
+    assert client.max_in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_publish_concurrency_is_bounded():
+    client = RecordingClient()
+    devices = [DeviceRecord(topic=f"light/{i}", payload=b"ON") for i in range(20)]
+    publisher = make_publisher(client, concurrency=4)
+
+    await publisher.publish(devices)
+
+    assert sorted(client.started) == sorted(d.topic for d in devices)
+    assert client.max_in_flight == 4
+    assert publisher.metrics.apply_count == 1
+    assert publisher.metrics.published_devices == 20
+
+
+@pytest.mark.asyncio
+async def test_publish_stages_run_in_order():
+    client = RecordingClient()
+    devices = [
+        DeviceRecord(topic="bulb/1", payload=b"ON", stage=1),
+        DeviceRecord(topic="relay/1", payload=b"ON", stage=0),
+        DeviceRecord(topic="bulb/2", payload=b"ON", stage=1),
+        DeviceRecord(topic="relay/2", payload=b"ON", stage=0),
+    ]
+
+    await make_publisher(client, concurrency=8).publish(devices)
+
+    assert set(client.started[:2]) == {"relay/1", "relay/2"}
+    assert set(client.started[2:]) == {"bulb/1", "bulb/2"}
+    assert client.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_publish_qos0_devices_skip_ack_slots():
+    client = RecordingClient()
+    devices = [
+        DeviceRecord(topic="light/1", payload=b"ON", qos=1),
+        DeviceRecord(topic="bulb/1", payload=b"ON", qos=0),
+        DeviceRecord(topic="bulb/2", payload=b"ON", qos=0),
+    ]
+
+    await make_publisher(client, concurrency=4).publish(devices)
+
+    assert client.started == ["bulb/1", "bulb/2", "light/1"]
+
+
+@pytest.mark.asyncio
+async def test_publish_stage_delay_does_not_block_other_tasks():
+    client = RecordingClient()
+    devices = [
+        DeviceRecord(topic="relay/1", payload=b"ON", stage=0),
+        DeviceRecord(topic="bulb/1", payload=b"ON", stage=1, stage_delay=0.05),
+    ]
+    publish = asyncio.create_task(make_publisher(client, concurrency=4).publish(devices))
+
+    await asyncio.sleep(0.02)
+    assert client.started == ["relay/1"]
+    assert not publish.done()
+
+    await publish
+    assert client.started == ["relay/1", "bulb/1"]
+
+
+@pytest.mark.asyncio
+async def test_publish_counts_failed_devices():
+    client = AsyncMock()
+    client.publish.side_effect = [None, aiomqtt.MqttError("disconnected"), None]
+    devices = [DeviceRecord(topic=f"light/{i}", payload=b"ON") for i in range(3)]
+
+    result = await make_publisher(client, concurrency=1).publish(devices)
+
+    assert (result.acknowledged, result.failed, result.timed_out) == (2, 1, 0)
+    assert result.elapsed_ms >= 0
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from pydantic import ValidationError
+
+from private_assistant_scene_skill.config import SkillConfig
+from private_assistant_scene_skill.metrics import PublishMetrics
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.publisher import ScenePublisher
+from private_assistant_scene_skill.rate_limiter import PublishRateLimiter, TokenBucket
+
+
+def test_token_bucket_paces_reservations():
+    bucket = TokenBucket(rate=10)
+    assert [bucket.reserve(now=0.0) for _ in range(3)] == pytest.approx([0.0, 0.1, 0.2])
+    # Idle time refills the bucket, but never beyond its burst
+    assert bucket.reserve(now=5.0) == 0.0
+    assert bucket.reserve(now=5.0) == pytest.approx(0.1)
+
+
+def test_token_bucket_allows_bursts():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve(now=0.0) for _ in range(4)] == pytest.approx([0.0, 0.0, 0.0, 0.1])
+
+
+def test_rate_limiter_prefers_longest_prefix():
+    limiter = PublishRateLimiter({"zigbee2mqtt/": 20, "zigbee2mqtt/kitchen/": 5})
+    assert limiter.bucket_for("zigbee2mqtt/kitchen/light/set").rate == 5
+    assert limiter.bucket_for("zigbee2mqtt/bedroom/light/set").rate == 20
+    assert limiter.bucket_for("shelly/relay/1") is None
+
+
+@pytest.mark.parametrize("rate", [0, -5])
+def test_config_rejects_non_positive_rates(rate):
+    with pytest.raises(ValidationError):
+        SkillConfig(publish_rate_limits={"zigbee2mqtt/": rate})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrency", [1, 2])
+async def test_throttled_prefix_does_not_hold_back_other_devices(concurrency):
+    client = AsyncMock()
+    published_at = {}
+
+    async def publish(topic, *_args, **_kwargs):
+        published_at[topic] = time.monotonic()
+
+    client.publish.side_effect = publish
+    publisher = ScenePublisher(
+        client,
+        concurrency=concurrency,
+        metrics=PublishMetrics(),
+        logger=Mock(),
+        rate_limiter=PublishRateLimiter({"zigbee2mqtt/": 20}),
+    )
+    # The throttled prefix comes first, so a shared sequential lane would delay the relays
+    devices = [DeviceRecord(topic=f"zigbee2mqtt/light/{i}", payload=b"ON") for i in range(4)]
+    devices += [DeviceRecord(topic=f"shelly/relay/{i}", payload=b"ON") for i in range(4)]
+
+    started_at = time.monotonic()
+    await asyncio.wait_for(publisher.publish(devices), timeout=1)
+
+    assert max(published_at[f"shelly/relay/{i}"] for i in range(4)) - started_at < 0.05
+    assert published_at["zigbee2mqtt/light/3"] - started_at >= 0.14
+    assert publisher.metrics.throttled_publishes == 3
+    # Concurrent publishes reserve their tokens up front and wait longer, sequential ones one interval each
+    expected_wait = 0.3 if concurrency > 1 else 0.15
+    assert publisher.metrics.throttle_wait_seconds == pytest.approx(expected_wait, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_sequential_lanes_keep_topic_order():
+    client = AsyncMock()
+    publisher = ScenePublisher(
+        client,
+        concurrency=1,
+        metrics=PublishMetrics(),
+        logger=Mock(),
+        rate_limiter=PublishRateLimiter({"zigbee2mqtt/": 1000}),
+    )
+    devices = [DeviceRecord(topic=topic, payload=b"ON") for topic in ["zigbee2mqtt/a", "shelly/a", "zigbee2mqtt/b"]]
+    devices.append(DeviceRecord(topic="zigbee2mqtt/a", payload=b"OFF"))
+
+    await publisher.publish(devices)
+
+    zigbee_publishes = [call.args[:2] for call in client.publish.await_args_list if call.args[0].startswith("zigbee")]
+    assert zigbee_publishes == [("zigbee2mqtt/a", b"ON"), ("zigbee2mqtt/b", b"ON"), ("zigbee2mqtt/a", b"OFF")]
@@ -0,0 +1,190 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from private_assistant_scene_skill.metrics import SceneCacheMetrics
+from private_assistant_scene_skill.models import DeviceRecord, SceneSkillDevices, SceneSkillScenes
+from private_assistant_scene_skill.scene_cache import (
+    SceneCache,
+    SceneCacheLoader,
+    SceneDeviceLRU,
+    merge_publish_plans,
+    normalize_scene_name,
+    scene_rows_query,
+)
+
+
+def test_normalize_scene_name():
+    assert normalize_scene_name("  Movie   Night ") == "movie night"
+
+
+def test_scene_cache_index_follows_updates():
+    cache = SceneCache({"Morning": [DeviceRecord(topic="light/1", payload=b"ON")]})
+    assert cache.match(["morning"]) == ["Morning"]
+
+    cache.set_scene("Evening", [])
+    assert cache.match(["EVENING"]) == ["Evening"]
+    assert len(cache) == 2
+
+    cache.remove_scene("Morning")
+    assert cache.match(["morning"]) == []
+    assert "Morning" not in cache
+    assert list(cache) == ["Evening"]
+
+
+def test_scene_cache_match_prefers_longest_scene():
+    cache = SceneCache({"movie": [], "movie night": [], "night": []})
+    assert cache.match(["movie", "night"], "start movie night now") == ["movie night"]
+    assert cache.match([], "start movie night now") == ["movie night"]
+    assert cache.match(["movie", "night"]) == ["movie", "night"]
+
+
+def test_scene_cache_match_single_word_scenes_only_from_nouns():
+    cache = SceneCache({"all": [], "evening": [], "good night": []})
+    assert cache.match(["scene", "evening"], "apply the evening scene in all rooms") == ["evening"]
+    assert cache.match([], "good night to all") == ["good night"]
+    assert cache.match(["all"], "apply all") == ["all"]
+    assert cache.fuzzy_match([], "turn on the lights in the hall", max_distance=2, time_budget_ms=100) == []
+
+
+def test_scene_cache_match_does_not_join_nouns():
+    cache = SceneCache({"movie night": []})
+    assert cache.match(["movie", "night"]) == []
+    assert cache.match(["movie night"]) == ["movie night"]
+
+
+def test_scene_cache_match_after_removal():
+    cache = SceneCache({"movie": [], "movie night": []})
+    cache.remove_scene("movie night")
+    assert cache.match(["movie"], "movie night") == ["movie"]
+    assert cache.match([], "movie night") == []
+
+
+async def scene_plan(ordered: bool, stage_delay: float, devices: list[tuple[str, int]]):
+    """Store one scene with devices given as (topic, stage) and return its plan as loaded by SceneCacheLoader."""
+    db_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with db_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(db_engine) as session:
+        session.add(
+            SceneSkillScenes(
+                name="evening",
+                ordered=ordered,
+                stage_delay=stage_delay,
+                devices=[SceneSkillDevices(topic=topic, stage=stage) for topic, stage in devices],
+            )
+        )
+        await session.commit()
+        loader = SceneCacheLoader()
+        async for partition in (await session.stream(scene_rows_query())).partitions():
+            loader.add_rows(partition)
+    await db_engine.dispose()
+    return loader.finish()["evening"]
+
+
+@pytest.mark.asyncio
+async def test_scene_cache_loader_orders_devices_of_ordered_scenes():
+    devices = [("relay/1", 0), ("bulb/1", 0)]
+    assert await scene_plan(True, 0.0, devices) == (
+        DeviceRecord(topic="relay/1", payload=b"ON", stage=0),
+        DeviceRecord(topic="bulb/1", payload=b"ON", stage=1),
+    )
+
+    assert [device.stage for device in await scene_plan(False, 0.0, devices)] == [0, 0]
+
+
+@pytest.mark.asyncio
+async def test_scene_cache_loader_keeps_device_stages_and_delays():
+    assert await scene_plan(False, 0.5, [("relay/1", 1), ("bulb/1", 2), ("relay/2", 1)]) == (
+        DeviceRecord(topic="relay/1", payload=b"ON", stage=1),
+        DeviceRecord(topic="bulb/1", payload=b"ON", stage=2, stage_delay=0.5),
+        DeviceRecord(topic="relay/2", payload=b"ON", stage=1),
+    )
+
+
+def test_merge_publish_plans_deduplicates_topics():
+    evening = (DeviceRecord(topic="light/1", payload=b"ON"), DeviceRecord(topic="light/2", payload=b"ON"))
+    night = (DeviceRecord(topic="light/2", payload=b"OFF"), DeviceRecord(topic="light/3", payload=b"OFF"))
+
+    assert merge_publish_plans([evening, night]) == [
+        DeviceRecord(topic="light/1", payload=b"ON"),
+        DeviceRecord(topic="light/2", payload=b"OFF"),
+        DeviceRecord(topic="light/3", payload=b"OFF"),
+    ]
+    assert merge_publish_plans([evening, night], last_wins=False)[1] == DeviceRecord(topic="light/2", payload=b"ON")
+    assert merge_publish_plans([evening]) == list(evening)
+
+
+def test_merge_publish_plans_keeps_same_topic_on_other_brokers():
+    home = (DeviceRecord(topic="light/1", payload=b"ON"),)
+    garden = (DeviceRecord(topic="light/1", payload=b"ON", broker="garden"),)
+    assert merge_publish_plans([home, garden]) == [*home, *garden]
+
+
+def test_scene_device_lru_evicts_least_recently_used():
+    metrics = SceneCacheMetrics()
+    lru = SceneDeviceLRU(max_scenes=2, metrics=metrics)
+    lru.put("morning", (DeviceRecord(topic="light/1", payload=b"ON"),))
+    lru.put("evening", ())
+    assert lru.get("morning") is not None
+    lru.put("night", ())
+
+    assert "morning" in lru and "night" in lru
+    assert lru.get("evening") is None
+    assert (metrics.device_cache_hits, metrics.device_cache_misses) == (1, 1)
+    assert metrics.device_cache_hit_ratio == 0.5
+    assert lru.device_counts({"morning": 1, "night": 3}) == {1: 1, 3: 0}
+
+
+@pytest.mark.asyncio
+async def test_scene_cache_loader_matches_orm_loading():
+    db_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with db_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(db_engine) as session:
+        session.add(
+            SceneSkillScenes(
+                name="wake up",
+                ordered=True,
+                stage_delay=2.0,
+                devices=[SceneSkillDevices(topic=f"light/{i}", qos=0) for i in range(3)],
+            )
+        )
+        session.add(SceneSkillScenes(name="empty"))
+        session.add(
+            SceneSkillScenes(
+                name="movie night",
+                stage_delay=0.5,
+                devices=[
+                    SceneSkillDevices(topic="blinds/1", scene_payload="CLOSE", retain=True, broker="garden"),
+                    SceneSkillDevices(topic="light/9", stage=1, state_topic="light/9/status"),
+                ],
+            )
+        )
+        await session.commit()
+        expected = {
+            "wake up": tuple(
+                DeviceRecord(topic=f"light/{i}", payload=b"ON", qos=0, stage=i, stage_delay=2.0 if i else 0.0)
+                for i in range(3)
+            ),
+            "empty": (),
+            "movie night": (
+                DeviceRecord(topic="blinds/1", payload=b"CLOSE", retain=True, broker="garden"),
+                DeviceRecord(topic="light/9", payload=b"ON", stage=1, stage_delay=0.5, state_topic="light/9/status"),
+            ),
+        }
+
+        for with_devices in (True, False):
+            loader = SceneCacheLoader(with_devices=with_devices)
+            rows = await session.stream(scene_rows_query(with_devices).execution_options(yield_per=2))
+            # Batches of two rows split the devices of the first scene
+            async for partition in rows.partitions():
+                loader.add_rows(partition)
+            cache = loader.finish()
+
+            assert list(cache) == list(expected)
+            assert cache.scene_ids() == {"wake up": 1, "empty": 2, "movie night": 3}
+            for name in expected:
+                assert cache[name] == (expected[name] if with_devices else ())
+    await db_engine.dispose()
@@ -0,0 +1,117 @@
+import io
+import pathlib
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from private_assistant_scene_skill.models import SceneSkillDevices, SceneSkillScenes
+from private_assistant_scene_skill.scene_io import (
+    SceneEntry,
+    SceneFormat,
+    SceneImportError,
+    format_for,
+    import_scenes,
+    invalid_topics,
+    read_scenes,
+    scene_writer,
+    stream_scenes,
+)
+from private_assistant_scene_skill.schema import migrate_schema
+
+SCENES_JSONL = """\
+{"name": "movie night", "ordered": true, "stage_delay": 0.5, "devices": [{"topic": "relay/1", "qos": 0}, \
+{"topic": "light/1", "scene_payload": "{\\"state\\": \\"ON\\"}", "stage": 1, "broker": "garden"}]}
+
+{"name": "empty"}
+{"name": "morning", "devices": [{"topic": "light/2", "state_topic": "light/2/status"}]}
+"""
+
+
+@pytest.fixture
+async def db_engine():
+    db_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    await migrate_schema(db_engine, Mock())
+    yield db_engine
+    await db_engine.dispose()
+
+
+async def export(db_engine, scene_format: SceneFormat) -> str:
+    file = io.StringIO()
+    write = scene_writer(file, scene_format)
+    async for scene in stream_scenes(db_engine, batch_size=2):
+        write(scene)
+    return file.getvalue()
+
+
+async def test_import_and_export_round_trip(db_engine):
+    scenes = list(read_scenes(io.StringIO(SCENES_JSONL), SceneFormat.JSONL))
+
+    assert await import_scenes(db_engine, scenes, batch_size=1) == (3, 3)
+
+    exported = list(read_scenes(io.StringIO(await export(db_engine, SceneFormat.CSV)), SceneFormat.CSV))
+    assert exported == scenes
+    assert exported[0].devices[1].scene_payload == '{"state": "ON"}'
+    assert list(read_scenes(io.StringIO(await export(db_engine, SceneFormat.JSONL)), SceneFormat.JSONL)) == scenes
+
+
+async def test_import_replaces_scenes_of_the_same_name(db_engine):
+    await import_scenes(db_engine, [SceneEntry.model_validate({"name": "morning", "devices": [{"topic": "a"}] * 3})])
+
+    await import_scenes(
+        db_engine, [SceneEntry.model_validate({"name": "morning", "devices": [{"topic": "b"}]})], replace=True
+    )
+
+    async with AsyncSession(db_engine) as session:
+        topics = (await session.exec(select(SceneSkillDevices.topic))).all()
+    assert topics == ["b"]
+
+
+async def test_import_rejects_invalid_topics_without_importing(db_engine):
+    scenes = [
+        SceneEntry.model_validate({"name": "valid", "devices": [{"topic": "light/1"}]}),
+        SceneEntry.model_validate(
+            {"name": "invalid", "devices": [{"topic": "light/#"}, {"topic": "light/2", "state_topic": "x" * 129}]}
+        ),
+    ]
+    assert len(invalid_topics(scenes)) == 2
+
+    with pytest.raises(SceneImportError, match="2 invalid topic"):
+        await import_scenes(db_engine, scenes)
+
+    async with AsyncSession(db_engine) as session:
+        assert (await session.exec(select(func.count()).select_from(SceneSkillDevices))).one() == 0
+
+
+def test_format_for():
+    assert format_for(pathlib.Path("scenes.CSV")) is SceneFormat.CSV
+    assert format_for(pathlib.Path("scenes.jsonl")) is SceneFormat.JSONL
+    assert format_for(pathlib.Path("-")) is SceneFormat.JSONL
+    assert format_for(pathlib.Path("scenes.txt"), SceneFormat.CSV) is SceneFormat.CSV
+    with pytest.raises(SceneImportError):
+        format_for(pathlib.Path("scenes.txt"))
+
+
+def test_read_scenes_reports_the_failing_line():
+    with pytest.raises(SceneImportError, match="Line 2"):
+        list(read_scenes(io.StringIO('{"name": "a"}\n{"name": "b", "stage_delay": -1}\n'), SceneFormat.JSONL))
+
+
+async def test_import_rejects_duplicate_scene_names(db_engine):
+    evening = SceneEntry.model_validate({"name": "evening", "devices": [{"topic": "light/1"}]})
+    await import_scenes(db_engine, [evening])
+
+    with pytest.raises(SceneImportError, match="already exist.*evening"):
+        await import_scenes(db_engine, [SceneEntry(name="morning"), evening])
+    morning = SceneEntry(name="morning")
+    # Duplicates within one batch and across batches
+    with pytest.raises(SceneImportError, match="more than once.*morning"):
+        await import_scenes(db_engine, [morning, morning], replace=True)
+    with pytest.raises(SceneImportError, match="more than once.*evening"):
+        await import_scenes(db_engine, [evening, evening], replace=True, batch_size=1)
+
+    async with AsyncSession(db_engine) as session:
+        assert (await session.exec(select(SceneSkillScenes.name))).all() == ["evening"]
@@ -0,0 +1,73 @@
+import asyncio
+import contextlib
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from private_assistant_scene_skill.scene_listener import SCENE_CHANGE_CHANNEL, SceneChangeListener
+
+
+@pytest.fixture
+def listener():
+    return SceneChangeListener(
+        db_engine=Mock(),
+        on_change=AsyncMock(),
+        on_resync=AsyncMock(),
+        logger=Mock(),
+        batch_window=0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_notifications_are_batched(listener):
+    for payload in ["3", "5", "3", "invalid"]:
+        listener._on_notification(None, 1, SCENE_CHANGE_CHANNEL, payload)
+
+    assert await listener._next_batch() == {3, 5}
+    listener.logger.warning.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_termination_ends_batch(listener):
+    listener._on_notification(None, 1, SCENE_CHANGE_CHANNEL, "3")
+    listener._on_termination(None)
+
+    with pytest.raises(ConnectionError):
+        await listener._next_batch()
+
+
+@pytest.mark.asyncio
+async def test_listener_recovers_after_failed_change_handling(listener):
+    drivers = [Mock(add_listener=AsyncMock()), Mock(add_listener=AsyncMock())]
+    connections = []
+    for driver in drivers:
+        conn = AsyncMock()
+        conn.get_raw_connection.return_value = Mock(driver_connection=driver)
+        # Closing the connection reports its termination, as asyncpg does
+        conn.invalidate.side_effect = lambda driver=driver: listener._on_termination(driver)
+        connections.append(conn)
+
+    @contextlib.asynccontextmanager
+    async def connect():
+        yield connections.pop(0)
+
+    listener.db_engine.connect = connect
+    listener.retry_interval = 0
+    handled = asyncio.Event()
+
+    async def on_change(_scene_ids):
+        if not listener.on_change.await_args_list[:-1]:
+            raise OperationalError("UPDATE", {}, Exception("gone"))
+        handled.set()
+
+    listener.on_change.side_effect = on_change
+    drivers[0].add_listener.side_effect = lambda *_: listener._on_notification(drivers[0], 1, SCENE_CHANGE_CHANNEL, "3")
+    listener.on_resync.side_effect = lambda: listener._on_notification(drivers[1], 1, SCENE_CHANGE_CHANNEL, "7")
+
+    task = asyncio.create_task(listener.run())
+    await asyncio.wait_for(handled.wait(), timeout=1)
+    task.cancel()
+
+    assert [call.args for call in listener.on_change.await_args_list] == [({3},), ({7},)]
+    drivers[0].remove_termination_listener.assert_called_once_with(listener._on_termination)
@@ -1,13 +1,20 @@
+import asyncio
+import json
 from unittest.mock import AsyncMock, Mock
 
 import jinja2
 import pytest
 from private_assistant_commons import messages
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlmodel import SQLModel
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from private_assistant_scene_skill.models import SceneSkillDevices
-from private_assistant_scene_skill.scene_skill import Action, Parameters, SceneSkill
+from private_assistant_scene_skill.config import SkillConfig
+from private_assistant_scene_skill.models import DeviceRecord, SceneSkillDevices, SceneSkillScenes
+from private_assistant_scene_skill.scene_cache import SceneCache
+from private_assistant_scene_skill.scene_skill import DELTA_REFRESH_OVERLAP, Action, Parameters, SceneSkill
+from private_assistant_scene_skill.scene_snapshot import read_snapshot, write_snapshot
+from private_assistant_scene_skill.state_mirror import StateMirror
 
 
 @pytest.fixture
@@ -56,7 +63,7 @@ async def scene_skill(
     db_engine,
 ):
     skill = SceneSkill(
-        config_obj=Mock(),
+        config_obj=SkillConfig(),
         mqtt_client=mock_mqtt_client,
         db_engine=db_engine,
         template_env=mock_template_env,
@@ -81,14 +88,126 @@ async def test_calculate_certainty_without_scenery(scene_skill):
 
 @pytest.mark.asyncio
 async def test_find_parameter_scenes(scene_skill):
-    scene_skill._scene_cache = {
-        "romantic": [SceneSkillDevices(topic="light/1", scene_payload="ON")],
-        "morning": [SceneSkillDevices(topic="light/2", scene_payload="ON")],
-    }
+    scene_skill._scene_cache = SceneCache(
+        {
+            "romantic": [DeviceRecord(topic="light/1", payload=b"ON")],
+            "morning": [DeviceRecord(topic="light/2", payload=b"ON")],
+        }
+    )
     names, devices = scene_skill.find_parameter_scenes(["romantic", "morning"])
     assert names == ["romantic", "morning"]
     assert len(devices) == 2
-    assert all(isinstance(d, SceneSkillDevices) for d in devices)
+    assert all(isinstance(d, DeviceRecord) for d in devices)
+
+
+@pytest.mark.asyncio
+async def test_find_parameter_scenes_merges_shared_topics(scene_skill):
+    scene_skill._scene_cache = SceneCache(
+        {
+            "evening": [DeviceRecord(topic="light/1", payload=b"ON"), DeviceRecord(topic="light/2", payload=b"ON")],
+            "night": [DeviceRecord(topic="light/2", payload=b"OFF")],
+        }
+    )
+    names, devices = scene_skill.find_parameter_scenes(["evening", "night"])
+    assert names == ["evening", "night"]
+    assert devices == [DeviceRecord(topic="light/1", payload=b"ON"), DeviceRecord(topic="light/2", payload=b"OFF")]
+
+
+@pytest.mark.asyncio
+async def test_find_parameter_scenes_normalizes_names(scene_skill):
+    scene_skill._scene_cache = SceneCache({"Romantic": [DeviceRecord(topic="light/1", payload=b"ON")]})
+    names, devices = scene_skill.find_parameter_scenes(["romantic", "ROMANTIC", "lights"])
+    assert names == ["Romantic"]
+    assert len(devices) == 1
+
+
+@pytest.mark.asyncio
+async def test_find_parameter_scenes_multi_word_from_text(scene_skill):
+    scene_skill._scene_cache = SceneCache(
+        {
+            "movie": [DeviceRecord(topic="light/1", payload=b"ON")],
+            "movie night": [DeviceRecord(topic="light/2", payload=b"OFF")],
+            "good morning": [DeviceRecord(topic="light/3", payload=b"ON")],
+        }
+    )
+    names, devices = scene_skill.find_parameter_scenes(
+        ["scene", "movie", "night"], "Please apply the scene movie night and good morning"
+    )
+    assert names == ["movie night", "good morning"]
+    assert [d.topic for d in devices] == ["light/2", "light/3"]
+
+
+@pytest.mark.asyncio
+async def test_find_parameter_scenes_keeps_spoken_order(scene_skill):
+    scene_skill._scene_cache = SceneCache(
+        {
+            "romantic": [DeviceRecord(topic="light/1", payload=b"DIM")],
+            "movie night": [DeviceRecord(topic="light/1", payload=b"OFF")],
+        }
+    )
+    names, devices = scene_skill.find_parameter_scenes(
+        ["scene", "romantic", "movie", "night"], "apply scene romantic and movie night"
+    )
+    assert names == ["romantic", "movie night"]
+    assert devices == [DeviceRecord(topic="light/1", payload=b"OFF")]
+
+    names, devices = scene_skill.find_parameter_scenes(
+        ["scene", "movie", "night", "romantic"], "apply scene movie night and romantic"
+    )
+    assert names == ["movie night", "romantic"]
+    assert devices == [DeviceRecord(topic="light/1", payload=b"DIM")]
+
+
+@pytest.mark.asyncio
+async def test_find_parameter_scenes_fuzzy_fallback(scene_skill):
+    scene_skill._scene_cache = SceneCache(
+        {
+            "romantic": [DeviceRecord(topic="light/1", payload=b"ON")],
+            "good morning": [DeviceRecord(topic="light/2", payload=b"ON")],
+        }
+    )
+    names, _ = scene_skill.find_parameter_scenes(["scene", "romantik"], "apply scene romantik")
+    assert names == ["romantic"]
+    names, _ = scene_skill.find_parameter_scenes(["scene"], "apply scene good mornin")
+    assert names == ["good morning"]
+
+
+@pytest.mark.asyncio
+async def test_find_parameter_scenes_fuzzy_disabled(scene_skill):
+    scene_skill.config_obj.fuzzy_match_enabled = False
+    scene_skill._scene_cache = SceneCache({"romantic": [DeviceRecord(topic="light/1", payload=b"ON")]})
+    names, devices = scene_skill.find_parameter_scenes(["romantik"])
+    assert names == []
+    assert devices == []
+
+
+@pytest.mark.asyncio
+async def test_load_scene_cache_builds_index(scene_skill, db_engine):
+    async with AsyncSession(db_engine) as session:
+        scene = SceneSkillScenes(name="Evening")
+        scene.devices = [SceneSkillDevices(topic="light/1", scene_payload="ON")]
+        session.add(scene)
+        await session.commit()
+
+    scene_skill._scene_cache = SceneCache()
+    await scene_skill.load_scene_cache()
+
+    assert list(scene_skill._scene_cache) == ["Evening"]
+    assert scene_skill._scene_cache.match(["evening"]) == ["Evening"]
+    assert scene_skill._scene_cache["Evening"] == (DeviceRecord(topic="light/1", payload=b"ON", qos=1),)
+
+
+@pytest.mark.asyncio
+async def test_load_scene_cache_keeps_device_qos_and_retain(scene_skill, db_engine):
+    async with AsyncSession(db_engine) as session:
+        scene = SceneSkillScenes(name="evening")
+        scene.devices = [SceneSkillDevices(topic="bulb/1", scene_payload="ON", qos=0, retain=True)]
+        session.add(scene)
+        await session.commit()
+
+    await scene_skill.reload_scene_cache()
+
+    assert scene_skill._scene_cache["evening"] == (DeviceRecord(topic="bulb/1", payload=b"ON", qos=0, retain=True),)
 
 
 @pytest.mark.asyncio
@@ -101,27 +220,27 @@ async def test_get_answer(scene_skill):
     answer = scene_skill.get_answer(Action.APPLY, parameters)
 
     assert answer == "Setting scene romantic"
-    mock_template.render.assert_called_once_with(action=Action.APPLY, parameters=parameters)
+    mock_template.render.assert_called_once_with(action=Action.APPLY, parameters=parameters, result=None)
 
 
 @pytest.mark.asyncio
 async def test_send_mqtt_command(scene_skill, mock_mqtt_client):
     devices = [
-        SceneSkillDevices(topic="light/1", scene_payload="ON"),
-        SceneSkillDevices(topic="light/2", scene_payload="OFF"),
+        DeviceRecord(topic="light/1", payload=b"ON"),
+        DeviceRecord(topic="light/2", payload=b"OFF"),
     ]
     parameters = Parameters(scene_names=["test"], devices=devices)
 
     await scene_skill.send_mqtt_command(parameters)
 
     assert mock_mqtt_client.publish.await_count == 2
-    mock_mqtt_client.publish.assert_any_await("light/1", "ON", qos=1)
-    mock_mqtt_client.publish.assert_any_await("light/2", "OFF", qos=1)
+    mock_mqtt_client.publish.assert_any_await("light/1", b"ON", qos=1, retain=False)
+    mock_mqtt_client.publish.assert_any_await("light/2", b"OFF", qos=1, retain=False)
 
 
 @pytest.mark.asyncio
 async def test_process_request_with_valid_action(scene_skill, monkeypatch):
-    mock_client_request = Mock(room="living")
+    mock_client_request = Mock(room="living", text="apply scene romantic")
     mock_intent_result = Mock(
         spec=messages.IntentAnalysisResult,
         verbs=["apply"],
@@ -129,7 +248,7 @@ async def test_process_request_with_valid_action(scene_skill, monkeypatch):
         client_request=mock_client_request,
     )
 
-    scene_skill._scene_cache = {"romantic": [SceneSkillDevices(topic="light/1", scene_payload="ON")]}
+    scene_skill._scene_cache = SceneCache({"romantic": [DeviceRecord(topic="light/1", payload=b"ON")]})
 
     monkeypatch.setattr(scene_skill, "send_response", AsyncMock())
     monkeypatch.setattr(scene_skill, "send_mqtt_command", AsyncMock())
@@ -138,3 +257,324 @@ async def test_process_request_with_valid_action(scene_skill, monkeypatch):
 
     scene_skill.send_response.assert_called_once()
     scene_skill.send_mqtt_command.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_refresh_scenes_patches_changed_scenes(scene_skill, db_engine):
+    async with AsyncSession(db_engine) as session:
+        evening = SceneSkillScenes(name="evening")
+        evening.devices = [SceneSkillDevices(topic="light/1", scene_payload="ON")]
+        morning = SceneSkillScenes(name="morning")
+        session.add_all([evening, morning])
+        await session.flush()
+        evening_id, morning_id = evening.id, morning.id
+        await session.commit()
+    await scene_skill.reload_scene_cache()
+
+    async with AsyncSession(db_engine) as session:
+        renamed = await session.get(SceneSkillScenes, evening_id)
+        renamed.name = "night"
+        session.add(SceneSkillDevices(topic="light/2", scene_payload="OFF", scene_id=evening_id))
+        await session.delete(await session.get(SceneSkillScenes, morning_id))
+        await session.commit()
+
+    await scene_skill.refresh_scenes({evening_id, morning_id})
+
+    assert list(scene_skill._scene_cache) == ["night"]
+    assert [d.topic for d in scene_skill._scene_cache["night"]] == ["light/1", "light/2"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_changed_scenes_fetches_delta(scene_skill, db_engine):
+    async with AsyncSession(db_engine) as session:
+        evening = SceneSkillScenes(name="evening")
+        evening.devices = [SceneSkillDevices(topic="light/1", scene_payload="ON")]
+        morning = SceneSkillScenes(name="morning")
+        morning.devices = [SceneSkillDevices(topic="light/2", scene_payload="ON")]
+        session.add_all([evening, morning])
+        await session.flush()
+        evening_id, morning_id = evening.id, morning.id
+        await session.commit()
+    await scene_skill.reload_scene_cache()
+
+    async with AsyncSession(db_engine) as session:
+        session.add(SceneSkillScenes(name="night"))
+        session.add(SceneSkillDevices(topic="light/3", scene_payload="OFF", scene_id=evening_id))
+        morning_device = (
+            await session.exec(select(SceneSkillDevices).where(SceneSkillDevices.scene_id == morning_id))
+        ).one()
+        await session.delete(morning_device)
+        await session.commit()
+
+    refresh_spy = AsyncMock(wraps=scene_skill.refresh_scenes)
+    scene_skill.refresh_scenes = refresh_spy
+    await scene_skill.refresh_changed_scenes()
+
+    assert sorted(scene_skill._scene_cache) == ["evening", "morning", "night"]
+    assert [d.topic for d in scene_skill._scene_cache["evening"]] == ["light/1", "light/3"]
+    assert scene_skill._scene_cache["morning"] == ()
+    refresh_spy.assert_awaited_once()
+
+    refresh_spy.reset_mock()
+    scene_skill._scene_watermark += DELTA_REFRESH_OVERLAP * 2
+    await scene_skill.refresh_changed_scenes()
+    refresh_spy.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_revalidate_scene_cache_swaps_in_background(scene_skill, db_engine):
+    scene_skill.config_obj.scene_cache_ttl = 0
+    async with AsyncSession(db_engine) as session:
+        session.add(SceneSkillScenes(name="evening"))
+        await session.commit()
+    stale_cache = scene_skill._scene_cache
+
+    async with asyncio.TaskGroup() as task_group:
+        scene_skill.task_group = task_group
+        scene_skill.revalidate_scene_cache()
+        scene_skill.revalidate_scene_cache()
+        assert scene_skill._scene_cache is stale_cache
+
+    assert list(scene_skill._scene_cache) == ["evening"]
+    assert scene_skill.metrics.scene_cache.swap_count == 2
+
+
+@pytest.mark.asyncio
+async def test_revalidate_scene_cache_survives_unreachable_database(scene_skill, monkeypatch):
+    scene_skill.config_obj.scene_cache_ttl = 0
+    monkeypatch.setattr(scene_skill, "reload_scene_cache", AsyncMock(side_effect=ConnectionRefusedError()))
+    stale_cache = scene_skill._scene_cache
+
+    async with asyncio.TaskGroup() as task_group:
+        scene_skill.task_group = task_group
+        scene_skill.revalidate_scene_cache()
+
+    assert scene_skill._scene_cache is stale_cache
+    assert scene_skill.metrics.scene_cache.failed_refresh_count == 1
+
+
+@pytest.mark.asyncio
+async def test_periodic_scene_refresh_survives_unreachable_database(scene_skill, monkeypatch):
+    refresh = AsyncMock(side_effect=[ConnectionRefusedError(), None, asyncio.CancelledError()])
+    monkeypatch.setattr(scene_skill, "refresh_changed_scenes", refresh)
+
+    with pytest.raises(asyncio.CancelledError):
+        await scene_skill.run_periodic_scene_refresh(0)
+
+    assert refresh.await_count == 3
+    scene_skill.logger.error.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_revalidate_scene_cache_within_ttl(scene_skill):
+    scene_skill.config_obj.scene_cache_ttl = 60
+    scene_skill.add_task = Mock()
+    scene_skill.revalidate_scene_cache()
+    scene_skill.add_task.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_metrics_serialization(scene_skill):
+    metrics = json.loads(scene_skill.metrics.model_dump_json())
+    assert metrics["scene_cache"]["swap_count"] == 1
+    assert metrics["scene_cache"]["staleness_seconds"] >= 0
+    assert "loaded_at" not in metrics["scene_cache"]
+
+
+@pytest.mark.asyncio
+async def test_process_request_coalesces_repeated_applies(scene_skill, monkeypatch):
+    scene_skill.config_obj.apply_coalesce_window = 60
+    scene_skill._scene_cache = SceneCache(
+        {
+            "romantic": [DeviceRecord(topic="light/1", payload=b"ON")],
+            "morning": [DeviceRecord(topic="light/2", payload=b"ON")],
+        }
+    )
+    monkeypatch.setattr(scene_skill, "send_response", AsyncMock())
+    monkeypatch.setattr(scene_skill, "send_mqtt_command", AsyncMock())
+
+    def intent(noun):
+        return Mock(
+            spec=messages.IntentAnalysisResult,
+            verbs=["apply"],
+            nouns=[noun],
+            client_request=Mock(room="living", text=f"apply scene {noun}"),
+        )
+
+    await scene_skill.process_request(intent("romantic"))
+    await scene_skill.process_request(intent("romantic"))
+    await scene_skill.process_request(intent("morning"))
+
+    assert scene_skill.send_response.call_count == 3
+    assert scene_skill.send_mqtt_command.call_count == 2
+    assert scene_skill.metrics.publish.coalesced_apply_count == 1
+
+
+@pytest.mark.asyncio
+async def test_claim_publish_wave_after_window(scene_skill, monkeypatch):
+    scene_skill.config_obj.apply_coalesce_window = 5
+    now = 1000.0
+    monkeypatch.setattr("private_assistant_scene_skill.scene_skill.time.monotonic", lambda: now)
+    assert scene_skill.claim_publish_wave(["romantic"])
+    assert not scene_skill.claim_publish_wave(["romantic"])
+    now += 5
+    assert scene_skill.claim_publish_wave(["romantic"])
+
+
+@pytest.mark.asyncio
+async def test_send_mqtt_command_skips_unchanged_devices(scene_skill, mock_mqtt_client):
+    scene_skill.state_mirror = StateMirror("/state", logger=scene_skill.logger)
+    scene_skill.state_mirror.update("light/1/state", b"ON")
+    devices = [DeviceRecord(topic="light/1", payload=b"ON"), DeviceRecord(topic="light/2", payload=b"ON")]
+
+    await scene_skill.send_mqtt_command(Parameters(scene_names=["test"], devices=devices))
+
+    mock_mqtt_client.publish.assert_awaited_once_with("light/2", b"ON", qos=1, retain=False)
+    assert scene_skill.metrics.publish.saved_publishes == 1
+
+
+@pytest.mark.asyncio
+async def test_apply_and_respond_reports_timed_out_devices(scene_skill, mock_mqtt_client, monkeypatch):
+    scene_skill.config_obj.apply_confirmation_timeout = 0.01
+    scene_skill.add_task = asyncio.create_task
+    monkeypatch.setattr(scene_skill, "send_response", AsyncMock())
+    monkeypatch.setattr(scene_skill, "get_answer", Mock(return_value="Applied"))
+    release = asyncio.Event()
+
+    async def publish(topic, *_args, **_kwargs):
+        if topic == "light/2":
+            await release.wait()
+
+    mock_mqtt_client.publish.side_effect = publish
+    parameters = Parameters(
+        scene_names=["romantic"],
+        devices=[DeviceRecord(topic="light/1", payload=b"ON"), DeviceRecord(topic="light/2", payload=b"ON")],
+    )
+
+    await scene_skill.apply_and_respond(Action.APPLY, parameters, client_request=Mock())
+
+    result = scene_skill.get_answer.call_args.args[2]
+    assert (result.acknowledged, result.timed_out, result.failed) == (1, 1, 0)
+    scene_skill.send_response.assert_awaited_once()
+    release.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert result.acknowledged == 2
+
+
+@pytest.mark.asyncio
+async def test_skill_starts_from_snapshot_and_reconciles(
+    tmp_path, db_engine, mock_mqtt_client, mock_template_env, mock_task_group, mock_logger
+):
+    snapshot_path = tmp_path / "scenes.snapshot"
+    write_snapshot(snapshot_path, SceneCache({"stale": [DeviceRecord(topic="light/1", payload=b"ON")]}))
+    async with AsyncSession(db_engine) as session:
+        session.add(SceneSkillScenes(name="romantic"))
+        await session.commit()
+    skill = SceneSkill(
+        config_obj=SkillConfig(scene_snapshot_path=snapshot_path),
+        mqtt_client=mock_mqtt_client,
+        db_engine=db_engine,
+        template_env=mock_template_env,
+        task_group=mock_task_group,
+        logger=mock_logger,
+    )
+    skill.add_task = asyncio.create_task
+
+    await skill.load_scene_cache()
+    assert list(skill._scene_cache) == ["stale"]
+
+    await skill._scene_reload_task
+    assert list(skill._scene_cache) == ["romantic"]
+    assert list(read_snapshot(snapshot_path).scene_cache) == ["romantic"]
+
+
+@pytest.mark.asyncio
+async def test_lazy_skill_prefetches_scenes_applied_before_restart(
+    tmp_path, db_engine, mock_mqtt_client, mock_template_env, mock_task_group, mock_logger
+):
+    snapshot_path = tmp_path / "scenes.snapshot"
+    async with AsyncSession(db_engine) as session:
+        for name in ["romantic", "morning"]:
+            scene = SceneSkillScenes(name=name)
+            scene.devices = [SceneSkillDevices(topic=f"{name}/light", scene_payload="ON")]
+            session.add(scene)
+        await session.commit()
+
+    def start_skill():
+        skill = SceneSkill(
+            config_obj=SkillConfig(lazy_scene_devices=True, scene_prefetch_count=1, scene_snapshot_path=snapshot_path),
+            mqtt_client=mock_mqtt_client,
+            db_engine=db_engine,
+            template_env=mock_template_env,
+            task_group=mock_task_group,
+            logger=mock_logger,
+        )
+        skill.add_task = asyncio.create_task
+        return skill
+
+    skill = start_skill()
+    await skill.load_scene_cache()
+    await skill.load_scene_devices(["morning"])
+    await skill.load_scene_devices(["morning"])
+    await skill.load_scene_devices(["romantic"])
+    await skill.reload_scene_cache()
+
+    # The apply counts survive the restart, so the prefetch after reconciling knows the popular scenes
+    restarted = start_skill()
+    await restarted.load_scene_cache()
+    await restarted._scene_reload_task
+    assert restarted._scene_apply_counts == {"morning": 2, "romantic": 1}
+    assert "morning" in restarted.scene_devices
+    assert "romantic" not in restarted.scene_devices
+
+
+@pytest.mark.asyncio
+async def test_lazy_scene_devices_load_on_demand(
+    db_engine, mock_mqtt_client, mock_template_env, mock_task_group, mock_logger
+):
+    async with AsyncSession(db_engine) as session:
+        for name in ["romantic", "morning"]:
+            scene = SceneSkillScenes(name=name)
+            scene.devices = [SceneSkillDevices(topic=f"{name}/light", scene_payload="ON")]
+            session.add(scene)
+        await session.commit()
+    skill = SceneSkill(
+        config_obj=SkillConfig(lazy_scene_devices=True, scene_device_cache_size=1, scene_prefetch_count=1),
+        mqtt_client=mock_mqtt_client,
+        db_engine=db_engine,
+        template_env=mock_template_env,
+        task_group=mock_task_group,
+        logger=mock_logger,
+    )
+    await skill.load_scene_cache()
+    assert sorted(skill._scene_cache) == ["morning", "romantic"]
+    assert skill._scene_cache["romantic"] == ()
+
+    assert await skill.load_scene_devices(["romantic"]) == [DeviceRecord(topic="romantic/light", payload=b"ON")]
+    assert await skill.load_scene_devices(["romantic"]) == [DeviceRecord(topic="romantic/light", payload=b"ON")]
+    await skill.load_scene_devices(["morning"])
+    await skill.load_scene_devices(["morning"])
+    await skill.load_scene_devices(["morning"])
+    assert "romantic" not in skill.scene_devices
+    assert skill.metrics.scene_cache.device_cache_hit_ratio == 0.6
+
+    await skill.reload_scene_cache()
+    assert "morning" in skill.scene_devices
+
+    await skill.refresh_scenes({skill._scene_cache.scene_ids()["morning"]})
+    assert "morning" not in skill.scene_devices
+
+
+@pytest.mark.asyncio
+async def test_lazy_apply_answers_when_database_is_unreachable(scene_skill, monkeypatch):
+    monkeypatch.setattr(scene_skill, "load_scene_devices", AsyncMock(side_effect=ConnectionRefusedError()))
+    monkeypatch.setattr(scene_skill, "send_response", AsyncMock())
+    client_request = Mock()
+
+    await scene_skill.apply_lazy_scenes(Action.APPLY, Parameters(scene_names=["romantic"]), client_request)
+
+    scene_skill.send_response.assert_awaited_once_with(
+        "Sorry, the scene romantic could not be applied right now.", client_request=client_request
+    )
+    scene_skill.mqtt_client.publish.assert_not_awaited()
@@ -0,0 +1,54 @@
+import pytest
+
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.scene_cache import SceneCache
+from private_assistant_scene_skill.scene_snapshot import read_snapshot, write_snapshot
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "scenes.snapshot"
+    scene_cache = SceneCache()
+    scene_cache.set_scene(
+        "movie night",
+        [
+            DeviceRecord(topic="relay/1", payload=b"ON", qos=0, retain=True),
+            DeviceRecord(topic="light/1", payload=b'{"state": "ON"}', stage=1, stage_delay=0.5, broker="garden"),
+        ],
+        scene_id=7,
+    )
+    scene_cache.set_scene("morning", [DeviceRecord(topic="light/2", payload=b"ON", state_topic="light/2/status")])
+
+    write_snapshot(path, scene_cache, apply_counts={"morning": 3, "deleted": 1})
+    snapshot = read_snapshot(path)
+
+    assert snapshot is not None
+    restored, apply_counts = snapshot
+    assert apply_counts == {"morning": 3}
+    assert list(restored) == ["movie night", "morning"]
+    assert restored["movie night"] == scene_cache["movie night"]
+    assert restored["morning"] == scene_cache["morning"]
+    assert restored.scene_ids() == {"movie night": 7}
+    assert restored.match([], "start movie night") == ["movie night"]
+    assert not path.with_name("scenes.snapshot.tmp").exists()
+
+
+def test_read_snapshot_missing_or_corrupt(tmp_path):
+    path = tmp_path / "scenes.snapshot"
+    assert read_snapshot(path) is None
+
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        read_snapshot(path)
+
+
+def test_read_snapshot_ignores_other_device_mode(tmp_path):
+    path = tmp_path / "scenes.snapshot"
+    write_snapshot(path, SceneCache({"movie night": []}), with_devices=False)
+
+    assert read_snapshot(path) is None
+    snapshot = read_snapshot(path, with_devices=False)
+    assert snapshot is not None
+    assert list(snapshot.scene_cache) == ["movie night"]
+
+    write_snapshot(path, SceneCache({"movie night": [DeviceRecord(topic="light/1", payload=b"ON")]}))
+    assert read_snapshot(path, with_devices=False) is None
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from private_assistant_scene_skill.models import SceneSkillScenes, utc_now
+from private_assistant_scene_skill.schema import SCHEMA_VERSION, migrate_schema, read_schema_version
+
+# Schema as created before it was versioned
+LEGACY_SCHEMA = [
+    "CREATE TABLE sceneskillscenes (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL)",
+    """
+    CREATE TABLE sceneskilldevices (
+        id INTEGER NOT NULL PRIMARY KEY,
+        topic VARCHAR NOT NULL,
+        scene_payload VARCHAR NOT NULL,
+        scene_id INTEGER NOT NULL REFERENCES sceneskillscenes (id)
+    )
+    """,
+    "INSERT INTO sceneskillscenes (id, name) VALUES (1, 'romantic')",
+    "INSERT INTO sceneskilldevices (id, topic, scene_payload, scene_id) VALUES (1, 'light/1', 'ON', 1)",
+]
+
+
+@pytest.fixture
+def db_engine():
+    return create_async_engine("sqlite+aiosqlite:///:memory:")
+
+
+def table_schema(conn):
+    inspector = inspect(conn)
+    return {
+        table: (
+            {column["name"]: (column["nullable"], column["default"]) for column in inspector.get_columns(table)},
+            sorted(index["name"] for index in inspector.get_indexes(table)),
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+@pytest.mark.asyncio
+async def test_migrate_schema_creates_fresh_database(db_engine):
+    logger = Mock()
+
+    await migrate_schema(db_engine, logger)
+    await migrate_schema(db_engine, logger)
+
+    async with db_engine.connect() as conn:
+        assert await conn.run_sync(read_schema_version) == SCHEMA_VERSION
+    logger.info.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_migrate_schema_upgrades_legacy_database(db_engine):
+    async with db_engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            await conn.execute(text(statement))
+
+    await migrate_schema(db_engine, Mock())
+
+    async with db_engine.connect() as conn:
+        assert await conn.run_sync(read_schema_version) == SCHEMA_VERSION
+        migrated_schema = await conn.run_sync(table_schema)
+    fresh_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    await migrate_schema(fresh_engine, Mock())
+    async with fresh_engine.connect() as conn:
+        fresh_schema = await conn.run_sync(table_schema)
+    await fresh_engine.dispose()
+    # Columns, nullability, defaults and indexes match those of a fresh database
+    assert migrated_schema == fresh_schema
+    assert fresh_schema["sceneskilldevices"][0]["updated_at"] == (False, "CURRENT_TIMESTAMP")
+
+    async with AsyncSession(db_engine) as session:
+        scene = (await session.exec(select(SceneSkillScenes).options(selectinload("*")))).one()
+    assert scene.name == "romantic"
+    assert (scene.devices[0].qos, scene.devices[0].retain, scene.devices[0].broker) == (1, False, None)
+
+
+@pytest.mark.asyncio
+async def test_migrate_schema_upgrades_unversioned_database_with_some_columns(db_engine):
+    # Databases of releases between the legacy schema and versioning have some of the columns
+    async with db_engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            await conn.execute(text(statement))
+        await conn.execute(text("ALTER TABLE sceneskillscenes ADD COLUMN ordered BOOLEAN NOT NULL DEFAULT 1"))
+        await conn.execute(text("ALTER TABLE sceneskilldevices ADD COLUMN stage INTEGER NOT NULL DEFAULT 2"))
+
+    await migrate_schema(db_engine, Mock())
+
+    async with AsyncSession(db_engine) as session:
+        scene = (await session.exec(select(SceneSkillScenes).options(selectinload("*")))).one()
+    assert (scene.ordered, scene.stage_delay, scene.devices[0].stage, scene.devices[0].qos) == (True, 0.0, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_plain_sql_update_bumps_updated_at(db_engine):
+    await migrate_schema(db_engine, Mock())
+    async with db_engine.begin() as conn:
+        await conn.execute(
+            text("INSERT INTO sceneskillscenes (id, name, updated_at) VALUES (1, 'romantic', '2000-01-01 00:00:00')")
+        )
+
+    async with db_engine.begin() as conn:
+        await conn.execute(text("UPDATE sceneskillscenes SET name = 'cozy' WHERE id = 1"))
+
+    async with AsyncSession(db_engine) as session:
+        scene = (await session.exec(select(SceneSkillScenes))).one()
+    assert scene.updated_at > datetime(2000, 1, 2)
+    assert utc_now() - scene.updated_at < timedelta(minutes=1)
@@ -0,0 +1,51 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.state_mirror import StateMirror, payload_matches_state
+
+
+@pytest.mark.parametrize(
+    "payload,state,expected",
+    [
+        (b"ON", b"ON", True),
+        (b"ON", b"OFF", False),
+        (b'{"state": "ON"}', b'{"state": "ON", "brightness": 200}', True),
+        (b'{"state": "ON", "brightness": 100}', b'{"state": "ON", "brightness": 200}', False),
+        (b'{"state": "ON"}', b"not json", False),
+        (b'{"state": "ON"}', b'["ON"]', False),
+    ],
+)
+def test_payload_matches_state(payload, state, expected):
+    assert payload_matches_state(payload, state) is expected
+
+
+@pytest.mark.asyncio
+async def test_state_mirror_subscribes_once_per_topic():
+    mirror = StateMirror("/state", logger=Mock())
+    client = AsyncMock()
+    devices = [
+        DeviceRecord(topic="light/1", payload=b"ON"),
+        DeviceRecord(topic="light/2", payload=b"ON", state_topic="light/2/status"),
+    ]
+
+    await mirror.subscribe(client, devices)
+    await mirror.subscribe(client, devices)
+
+    client.subscribe.assert_awaited_once_with([("light/1/state", 0), ("light/2/status", 0)])
+    assert mirror.is_state_topic("light/2/status")
+    assert not mirror.is_state_topic("light/2/state")
+
+
+def test_state_mirror_changed_devices():
+    mirror = StateMirror("/state", logger=Mock())
+    devices = [
+        DeviceRecord(topic="light/1", payload=b"ON"),
+        DeviceRecord(topic="light/2", payload=b"ON"),
+        DeviceRecord(topic="light/3", payload=b"ON"),
+    ]
+    mirror.update("light/1/state", b"ON")
+    mirror.update("light/2/state", b"OFF")
+
+    assert mirror.changed_devices(devices) == devices[1:]
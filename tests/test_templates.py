@@ -1,7 +1,8 @@
 import jinja2
 import pytest
 
-from private_assistant_scene_skill.models import SceneSkillDevices
+from private_assistant_scene_skill.models import DeviceRecord
+from private_assistant_scene_skill.publisher import PublishResult
 from private_assistant_scene_skill.scene_skill import Parameters
 
 
@@ -19,7 +20,7 @@ def jinja_env():
             "apply.j2",
             Parameters(
                 scene_names=["romantic"],
-                devices=[SceneSkillDevices(topic="light/1", scene_payload="ON")],
+                devices=[DeviceRecord(topic="light/1", payload=b"ON")],
             ),
             "The scene romantic has been applied affecting 1 device.\n",
         ),
@@ -28,8 +29,8 @@ def jinja_env():
             Parameters(
                 scene_names=["romantic", "morning"],
                 devices=[
-                    SceneSkillDevices(topic="light/1", scene_payload="ON"),
-                    SceneSkillDevices(topic="light/2", scene_payload="ON"),
+                    DeviceRecord(topic="light/1", payload=b"ON"),
+                    DeviceRecord(topic="light/2", payload=b"ON"),
                 ],
             ),
             "The scenes romantic and morning have been applied affecting 2 devices.\n",
@@ -50,3 +51,16 @@ def test_templates(jinja_env, template_name, parameters, expected_output):
     template = jinja_env.get_template(template_name)
     result = template.render(parameters=parameters)
     assert result == expected_output
+
+
+def test_apply_template_with_publish_result(jinja_env):
+    template = jinja_env.get_template("apply.j2")
+    parameters = Parameters(
+        scene_names=["romantic"],
+        devices=[DeviceRecord(topic=f"light/{i}", payload=b"ON") for i in range(4)],
+    )
+    result = PublishResult(4, acknowledged=2, failed=1, started_at=0.0, finished_at=0.12)
+
+    assert template.render(parameters=parameters, result=result) == (
+        "The scene romantic has been applied: 2 of 4 devices confirmed, 1 timed out and 1 failed after 120 ms.\n"
+    )